@@ -0,0 +1,355 @@
+"""Driver benchmark
+
+Run put, get, copy, files and delete on every driver against local stand-ins, a temp folder for Local,
+moto server for S3, pyftpdlib for FTP and a stubbed Dropbox client with injected latency.
+Each operation is measured for every object size and concurrency level, throughput, p50/p99 latency
+and peak RSS are printed and saved as JSON, so runs before and after a change can be compared.
+Drivers whose stand-in is not installed (moto, pyftpdlib, dropbox) are skipped.
+
+Run:
+    python benchmarks/drivers.py
+    python benchmarks/drivers.py --drivers local ftp --sizes 1024 1048576 --concurrency 1 16 --count 64
+    python benchmarks/drivers.py --latency 50 --output after.json
+    python benchmarks/drivers.py --compare before.json after.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Thread, Event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from diskpy.drivers import Local, S3, FTP, Dropbox  # noqa: E402
+
+OPERATIONS = ('put', 'get', 'copy', 'files', 'delete')
+
+# FTP transfers text line by line without binary mode
+KWARGS = {'ftp': {'binary': True}}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def local_disk(path, latency, concurrency):
+    yield Local({'base': path, 'concurrency': concurrency})
+
+
+@contextmanager
+def s3_disk(path, latency, concurrency):
+    import boto3
+    from moto.server import ThreadedMotoServer
+
+    port = free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+
+    setting = {'bucket': 'bench', 'region': 'us-east-1', 'access_key': 'bench', 'secret_key': 'bench',
+               'endpoint': 'http://127.0.0.1:%d' % port, 'concurrency': concurrency}
+
+    try:
+        boto3.client('s3', region_name='us-east-1', aws_access_key_id='bench', aws_secret_access_key='bench',
+                     endpoint_url=setting['endpoint']).create_bucket(Bucket='bench')
+        yield S3(setting)
+    finally:
+        server.stop()
+
+
+@contextmanager
+def ftp_disk(path, latency, concurrency):
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_user('bench', 'bench', path, perm='elradfmwMT')
+
+    handler = type('Handler', (FTPHandler,), {'authorizer': authorizer})
+    server = ThreadedFTPServer(('127.0.0.1', 0), handler)
+    thread = Thread(target=server.serve_forever, kwargs={'timeout': 0.1}, daemon=True)
+    thread.start()
+
+    driver = FTP({'base': '/', 'host': '127.0.0.1', 'port': server.address[1], 'username': 'bench',
+                  'password': 'bench', 'pool_size': concurrency})
+
+    try:
+        yield driver
+    finally:
+        driver.close()
+        server.close_all()
+
+
+class StubDropbox:
+    """In memory Dropbox client, every call sleeps ``latency`` seconds like a round trip"""
+
+    def __init__(self, latency):
+        from dropbox.exceptions import ApiError
+        from dropbox.files import FileMetadata
+
+        self.latency = latency
+        self.files = {}
+        self.error = ApiError
+        self.metadata = FileMetadata
+
+    def files_upload(self, content, path, mode=None):
+        self.__wait()
+        self.files[path] = content if isinstance(content, bytes) else content.encode()
+        return self.__metadata(path)
+
+    def files_download(self, path):
+        self.__wait()
+        return self.__metadata(path), _Response(self.__content(path))
+
+    def files_get_metadata(self, path):
+        self.__wait()
+        return self.__metadata(path)
+
+    def files_copy(self, path, destination):
+        self.__wait()
+        self.files[destination] = self.__content(path)
+        return self.__metadata(destination)
+
+    def files_move(self, path, destination):
+        self.files_copy(path, destination)
+        del self.files[path]
+
+    def files_delete(self, path):
+        self.__wait()
+        self.__content(path)
+        del self.files[path]
+
+    def files_list_folder(self, path, recursive=False):
+        self.__wait()
+        folder = path.rstrip('/') + '/'
+        entries = [self.__metadata(p) for p in list(self.files) if p.startswith(folder)
+                   and (recursive or '/' not in p[len(folder):])]
+        return _Result(entries)
+
+    def __metadata(self, path):
+        return self.metadata(name=path.rsplit('/', 1)[-1], path_display=path, size=len(self.__content(path)),
+                             rev='0' * 9)
+
+    def __content(self, path):
+        content = self.files.get(path)
+
+        if content is None:
+            raise self.error('stub', None, None, None)
+
+        return content
+
+    def __wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class _Response:
+    def __init__(self, content):
+        self.content = content
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class _Result:
+    def __init__(self, entries):
+        self.entries = entries
+        self.has_more = False
+        self.cursor = None
+
+
+@contextmanager
+def dropbox_disk(path, latency, concurrency):
+    driver = Dropbox({'base': '', 'access_token': 'bench'})
+    driver._Dropbox__client = StubDropbox(latency)
+    yield driver
+
+
+STANDINS = {'local': local_disk, 's3': s3_disk, 'ftp': ftp_disk, 'dropbox': dropbox_disk}
+
+
+class PeakRSS:
+    """Sample the resident memory in background thread, ru_maxrss only grows for the whole process"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self.stop = Event()
+        self.thread = Thread(target=self.__sample, daemon=True)
+
+    def __enter__(self):
+        self.peak = rss()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop.set()
+        self.thread.join()
+
+    def __sample(self):
+        while not self.stop.wait(self.interval):
+            self.peak = max(self.peak, rss())
+
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values, q):
+    """Nearest rank percentile of sorted values"""
+    return values[max(0, math.ceil(q / 100.0 * len(values)) - 1)]
+
+
+def measure(call, items, concurrency):
+    """Run the call for every item with ``concurrency`` threads
+
+    Returns:
+        tuple: wall seconds, sorted seconds of each call, number of failed calls.
+    """
+    def timed(item):
+        start = time.perf_counter()
+        result = call(item)
+        return time.perf_counter() - start, result is False
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(timed, items))
+
+    wall = time.perf_counter() - start
+    return wall, sorted(t for t, failed in results), sum(failed for t, failed in results)
+
+
+def bench(name, driver, size, concurrency, count):
+    kwargs = KWARGS.get(name, {})
+    content = (b'0123456789abcdef' * (size // 16 + 1))[:size]
+    names = ['bench/%d-%d.txt' % (size, i) for i in range(count)]
+
+    def delete(filename):
+        return driver.delete(filename) and driver.delete(filename + '.copy')
+
+    calls = {
+        'put': (lambda f: driver.put(f, content, **kwargs), size),
+        'get': (lambda f: driver.get(f, **kwargs), size),
+        'copy': (lambda f: driver.copy(f, f + '.copy'), size),
+        'files': (lambda f: list(driver.files('bench')), 0),
+        'delete': (delete, 0),
+    }
+
+    results = []
+
+    for operation in OPERATIONS:
+        call, moved = calls[operation]
+
+        with PeakRSS() as peak:
+            wall, times, failed = measure(call, names, concurrency)
+
+        results.append({
+            'driver': name,
+            'operation': operation,
+            'size': size,
+            'concurrency': concurrency,
+            'count': count,
+            'failed': failed,
+            'seconds': wall,
+            'ops_per_second': count / wall,
+            'mb_per_second': moved * count / wall / 1e6 if moved else None,
+            'p50_ms': percentile(times, 50) * 1000,
+            'p99_ms': percentile(times, 99) * 1000,
+            'peak_rss_mb': peak.peak / 1e6,
+        })
+
+        print_row(results[-1])
+
+    return results
+
+
+def print_row(row):
+    mb = '%9.2f' % row['mb_per_second'] if row['mb_per_second'] is not None else '%9s' % '-'
+    print('%-8s %-7s %9d %4d %9.1f %s %9.2f %9.2f %8.1f %s' % (
+        row['driver'], row['operation'], row['size'], row['concurrency'], row['ops_per_second'], mb,
+        row['p50_ms'], row['p99_ms'], row['peak_rss_mb'], 'failed %d' % row['failed'] if row['failed'] else ''))
+
+
+def compare(before, after):
+    """Print p50 latency and throughput of the second run relative to the first one"""
+    def key(row):
+        return row['driver'], row['operation'], row['size'], row['concurrency']
+
+    with open(before) as f:
+        rows = {key(r): r for r in json.load(f)['results']}
+
+    with open(after) as f:
+        print('%-8s %-7s %9s %4s %10s %10s %10s' % ('driver', 'op', 'size', 'conc', 'p50 old', 'p50 new', 'ops x'))
+
+        for row in json.load(f)['results']:
+            old = rows.get(key(row))
+
+            if old is not None:
+                print('%-8s %-7s %9d %4d %10.2f %10.2f %10.2f' % (key(row) + (
+                    old['p50_ms'], row['p50_ms'], row['ops_per_second'] / old['ops_per_second'])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--drivers', nargs='+', choices=list(STANDINS), default=list(STANDINS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1024, 64 * 1024, 1024 * 1024])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8])
+    parser.add_argument('--count', type=int, default=32, help='objects per size and concurrency')
+    parser.add_argument('--latency', type=float, default=10, help='ms injected in each Dropbox call')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+
+    results = []
+    print('%-8s %-7s %9s %4s %9s %9s %9s %9s %8s' % (
+        'driver', 'op', 'size', 'conc', 'ops/s', 'MB/s', 'p50 ms', 'p99 ms', 'RSS MB'))
+
+    for name in args.drivers:
+        for concurrency in args.concurrency:
+            with tempfile.TemporaryDirectory() as path:
+                try:
+                    with STANDINS[name](path, args.latency / 1000.0, concurrency) as driver:
+                        for size in args.sizes:
+                            results += bench(name, driver, size, concurrency, args.count)
+                except ImportError as e:
+                    print('%-8s skipped, %s' % (name, e))
+                    break
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'args': vars(args),
+            'results': results
+        }, f, indent=2)
+
+    print('Saved', args.output)
+
+
+if __name__ == '__main__':
+    main()
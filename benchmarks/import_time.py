@@ -0,0 +1,105 @@
+"""Import time benchmark
+
+Measure how long a fresh interpreter takes to import diskpy and build a Local disk,
+next to the cost of the SDKs which are now imported only when their driver is built.
+The lazy import is compared with an eager run which also imports ftplib, boto3 and dropbox
+like diskpy did before, SDKs which are not installed are left out of the eager run.
+
+Run:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+    ('import diskpy', 'import diskpy'),
+    ('import diskpy.drivers *', 'from diskpy.drivers import *'),
+    ('Local Disk()', 'from diskpy.drivers import Local; Local({"base": "."})'),
+    ('import boto3', 'import boto3'),
+    ('import dropbox', 'import dropbox'),
+]
+
+SDKS = ('ftplib', 'boto3', 'dropbox')
+
+# A process which uses Local disks only, eagerly it also paid for every SDK
+LAZY = 'import diskpy; from diskpy.drivers import Local'
+
+TIMER = '''
+import time
+start = time.perf_counter()
+{}
+print(time.perf_counter() - start)
+'''
+
+
+def measure(statement, runs):
+    """Run the statement in fresh interpreters
+
+    Returns:
+        list: seconds of each run, empty if the statement failed.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    times = []
+
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', TIMER.format(statement)], env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return []
+
+        times.append(float(result.stdout))
+
+    return times
+
+
+def installed(module):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, '-c', 'import ' + module], env=env, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode == 0
+
+
+def compare(runs):
+    """Print eager import time next to the lazy one and the difference"""
+    sdks = [m for m in SDKS if installed(m)]
+    lazy_times = measure(LAZY, runs)
+    eager_times = measure(LAZY + ''.join('; import ' + m for m in sdks), runs)
+
+    if not lazy_times or not eager_times:
+        print('comparison failed')
+        return
+
+    lazy, eager = statistics.median(lazy_times) * 1000, statistics.median(eager_times) * 1000
+
+    print()
+    print('eager imports: %s' % ', '.join(sdks))
+    print('%-26s %10.2f' % ('eager median ms', eager))
+    print('%-26s %10.2f' % ('lazy median ms', lazy))
+    print('%-26s %10.2f (%.1fx faster)' % ('saved ms', eager - lazy, eager / lazy))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print('%-26s %10s %10s' % ('statement', 'median ms', 'min ms'))
+
+    for name, statement in STATEMENTS:
+        times = measure(statement, args.runs)
+
+        if times:
+            print('%-26s %10.2f %10.2f' % (name, statistics.median(times) * 1000, min(times) * 1000))
+        else:
+            print('%-26s %10s %10s' % (name, 'n/a', 'n/a'))
+
+    compare(args.runs)
+
+
+if __name__ == '__main__':
+    main()
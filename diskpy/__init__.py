@@ -8,6 +8,15 @@ from .main import Disk, SettingException
 
 __version__ = '0.1.0'
 
+
+def __getattr__(name):
+    """Import AsyncDisk on first access, asyncio is slow to import"""
+    if name == 'AsyncDisk':
+        from .aio import AsyncDisk
+        return AsyncDisk
+
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
 r"""
       __________
      |__________|
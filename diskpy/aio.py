@@ -0,0 +1,122 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import GeneratorType
+from weakref import WeakKeyDictionary
+
+from .main import Disk
+
+# One bounded executor per driver object, shared by every AsyncDisk using it
+_executors = WeakKeyDictionary()
+
+
+class AsyncDisk:
+    """AsyncDisk Class
+
+    Asyncio wrapper for Disk.
+    Driver calls block, so they run in a bounded executor of the driver and are awaited from the event loop"""
+
+    def __init__(self, disk=None, workers=8, **kwargs):
+        """Init async disk object
+
+        Args:
+            disk (str): Name of disk in setting module, if is none will use default disk.
+            workers (optional[int]): max number of threads running calls of the driver.
+            **kwargs: Additional args will pass to driver
+
+        Returns:
+            AsyncDisk class object
+
+        Raises:
+            SettingException: Setting module not found or Driver not found.
+        """
+        self.disk = Disk(disk, **kwargs)
+        self.driver = self.disk.driver
+
+        if self.driver not in _executors:
+            _executors[self.driver] = ThreadPoolExecutor(workers)
+
+        self.executor = _executors[self.driver]
+
+    async def put(self, filename, content=None, **kwargs):
+        return await self.__call('put', filename, content, **kwargs)
+
+    async def get(self, filename, save_to=None, **kwargs):
+        return await self.__call('get', filename, save_to, **kwargs)
+
+    async def iter_get(self, filename, chunk_size=65536, **kwargs):
+        """Iterate file from the storage
+
+        Every chunk is read by the executor, so a large file never blocks the event loop for long.
+
+        Raises:
+            OSError: if failed to get the file, so a missing file is not taken for an empty one.
+
+        Examples:
+            async for chunk in disk.iter_get('filename.txt'):
+                print(chunk)
+        """
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(self.executor, partial(self.disk.iter_get, filename, chunk_size,
+                                                                   **kwargs))
+        if chunks is False:
+            raise OSError('Failed to get ' + filename)
+
+        done = object()
+
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.executor, next, chunks, done)
+
+                if chunk is done:
+                    break
+
+                yield chunk
+        finally:
+            await loop.run_in_executor(self.executor, chunks.close)
+
+    async def delete(self, filename, **kwargs):
+        return await self.__call('delete', filename, **kwargs)
+
+    async def delete_many(self, filenames, **kwargs):
+        return await self.__call('delete_many', filenames, **kwargs)
+
+    async def copy(self, filename, destination, **kwargs):
+        return await self.__call('copy', filename, destination, **kwargs)
+
+    async def move(self, filename, destination, **kwargs):
+        return await self.__call('move', filename, destination, **kwargs)
+
+    async def exist(self, filename, **kwargs):
+        return await self.__call('exist', filename, **kwargs)
+
+    async def size(self, filename, **kwargs):
+        return await self.__call('size', filename, **kwargs)
+
+    async def permissions(self, filename, **kwargs):
+        return await self.__call('permissions', filename, **kwargs)
+
+    async def files(self, directory=None, prefix=None, suffix=None, **kwargs):
+        return await self.__call('files', directory, prefix, suffix, **kwargs)
+
+    async def dirs(self, directory=None, prefix=None, suffix=None, **kwargs):
+        return await self.__call('dirs', directory, prefix, suffix, **kwargs)
+
+    async def make_dir(self, directory):
+        return await self.__call('make_dir', directory)
+
+    async def delete_dir(self, directory):
+        return await self.__call('delete_dir', directory)
+
+    async def __call(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(self.__run, method, *args, **kwargs))
+
+    def __run(self, method, *args, **kwargs):
+        result = getattr(self.disk, method)(*args, **kwargs)
+
+        # Lazy listings would do their network calls on the event loop, consume them here
+        if isinstance(result, GeneratorType):
+            result = list(result)
+
+        return result
@@ -0,0 +1,290 @@
+import os
+import shutil
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from hashlib import sha1
+from threading import Lock
+
+_Entry = namedtuple('_Entry', ['path', 'revision', 'size', 'checked'])
+
+
+class MetadataCache:
+    """ MetadataCache class keep results of metadata calls
+
+    LRU cache with TTL for exist, permissions and listings results, negative results can have shorter TTL.
+    """
+
+    def __init__(self, ttl=30, negative_ttl=None, size=1024):
+        """Init MetadataCache object
+
+        Args:
+            ttl (optional[int]): seconds a result stays valid.
+            negative_ttl (optional[int]): seconds a False result stays valid, if is none will use ttl.
+            size (optional[int]): max number of results to keep, least recently used are evicted first.
+
+        Returns:
+            MetadataCache class object
+        """
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        """Get cached result
+
+        Args:
+            key (tuple): method name, args and kwargs of the call.
+
+        Returns:
+            tuple: (True, result) if cached and not expired, (False, None) otherwise.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                return False, None
+
+            value, expires = entry
+
+            if time.monotonic() >= expires:
+                del self.entries[key]
+                return False, None
+
+            self.entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        ttl = self.negative_ttl if value is False else self.ttl
+
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, filenames):
+        """Invalidate changed files
+
+        Drop the cached exist and permissions of the files, and all listings as any of them may include the files.
+
+        Args:
+            filenames (list): the names of the changed files.
+        """
+        filenames = set(filenames)
+
+        with self.lock:
+            for key in list(self.entries):
+                method, args = key[0], key[1]
+
+                if method in ('files', 'dirs') or (args and args[0] in filenames):
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class ContentCache:
+    """ ContentCache class keep copies of remote files on local disk
+
+    Wrap a remote driver, get and iter_get read through an LRU cache of files limited by total bytes.
+    Cached copies are revalidated with the driver get_if_changed (S3 ETag, Dropbox rev, FTP modification time)
+    and concurrent misses of the same file are collapsed into one download.
+    """
+
+    def __init__(self, driver, path, size=1024 * 1024 * 1024, ttl=0, chunk_size=65536, name=None):
+        """Init ContentCache object
+
+        Args:
+            driver (object): the remote driver to wrap.
+            path (str): local folder to keep cached files in it.
+            size (optional[int]): max total bytes of cached files, least recently used are evicted first.
+            ttl (optional[int]): seconds a cached file is used without revalidating.
+            chunk_size (optional[int]): size of each chunk read from the driver and the cache.
+            name (optional[str]): subfolder of path for the files of this disk, so disks can share the path.
+
+        Returns:
+            ContentCache class object
+        """
+        self.driver = driver
+        self.path = path if name is None else os.path.join(path, name)
+        self.size = size
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+        self.entries = OrderedDict()
+        self.used = 0
+        self.fetching = {}
+        self.lock = Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+
+        # The index is kept in memory, files from a previous run are unknown
+        for name in os.listdir(self.path):
+            if name.endswith('.cache'):
+                os.remove(os.path.join(self.path, name))
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def get(self, filename, save_to=None, **kwargs):
+        if kwargs or not hasattr(self.driver, 'get_if_changed'):
+            return self.driver.get(filename, save_to, **kwargs)
+
+        file = self.__open(filename)
+
+        if file is False:
+            return False
+
+        with file:
+            if save_to is not None:
+                with open(save_to, 'wb') as f:
+                    shutil.copyfileobj(file, f)
+
+                file.seek(0)
+
+            return file.read()
+
+    def iter_get(self, filename, chunk_size=65536, **kwargs):
+        if kwargs or not hasattr(self.driver, 'get_if_changed'):
+            return self.driver.iter_get(filename, chunk_size, **kwargs)
+
+        file = self.__open(filename)
+        return self.__read(file, chunk_size) if file is not False else False
+
+    def put(self, filename, *args, **kwargs):
+        return self.__write('put', [filename], filename, *args, **kwargs)
+
+    def delete(self, filename, **kwargs):
+        return self.__write('delete', [filename], filename, **kwargs)
+
+    def delete_many(self, filenames, **kwargs):
+        results = self.driver.delete_many(filenames, **kwargs)
+        self.invalidate(list(results))
+        return results
+
+    def copy(self, filename, destination, **kwargs):
+        return self.__write('copy', [destination], filename, destination, **kwargs)
+
+    def move(self, filename, destination, **kwargs):
+        return self.__write('move', [filename, destination], filename, destination, **kwargs)
+
+    def invalidate(self, filenames):
+        with self.lock:
+            for filename in filenames:
+                entry = self.entries.pop(filename, None)
+
+                if entry is not None:
+                    self.used -= entry.size
+                    self.__remove(entry.path)
+
+    def __write(self, method, filenames, *args, **kwargs):
+        result = getattr(self.driver, method)(*args, **kwargs)
+        self.invalidate(filenames)
+        return result
+
+    def __open(self, filename):
+        while True:
+            path = self.__fetch(filename)
+
+            if path is False:
+                return False
+
+            # Evictions remove files under the lock, the copy is opened before another fetch can evict it
+            with self.lock:
+                entry = self.entries.get(filename)
+
+                if entry is not None and entry.path == path:
+                    return open(path, 'rb')
+
+    def __fetch(self, filename):
+        with self.lock:
+            future = self.fetching.get(filename)
+            owner = future is None
+
+            if owner:
+                future = self.fetching[filename] = Future()
+
+        # Another thread is downloading the same file, wait for it
+        if not owner:
+            return future.result()
+
+        try:
+            path = self.__revalidate(filename)
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.fetching[filename]
+
+    def __revalidate(self, filename):
+        with self.lock:
+            entry = self.entries.get(filename)
+
+            if entry is not None and time.monotonic() < entry.checked + self.ttl:
+                self.entries.move_to_end(filename)
+                return entry.path
+
+        result = self.driver.get_if_changed(filename, None if entry is None else entry.revision, self.chunk_size)
+
+        if result is False:
+            return False
+
+        revision, chunks = result
+
+        if chunks is None:
+            with self.lock:
+                if self.entries.get(filename) is entry:
+                    self.entries[filename] = entry._replace(checked=time.monotonic())
+                    self.entries.move_to_end(filename)
+                    return entry.path
+
+            # Invalidated while checking, the copy is gone
+            return self.__revalidate(filename)
+
+        path = os.path.join(self.path, sha1(filename.encode()).hexdigest() + '.cache')
+        size = 0
+
+        # Write aside and rename, readers of the old copy keep their open file
+        with open(path + '.tmp', 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+
+        os.replace(path + '.tmp', path)
+
+        with self.lock:
+            old = self.entries.pop(filename, None)
+
+            if old is not None:
+                self.used -= old.size
+
+            self.entries[filename] = _Entry(path, revision, size, time.monotonic())
+            self.used += size
+
+            # Never evict the file just fetched, even if it is larger than the budget
+            while self.used > self.size and len(self.entries) > 1:
+                entry = self.entries.popitem(last=False)[1]
+                self.used -= entry.size
+                self.__remove(entry.path)
+
+        return path
+
+    @staticmethod
+    def __read(file, chunk_size):
+        with file:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                yield chunk
+
+    @staticmethod
+    def __remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,402 @@
+import zlib
+from inspect import signature
+from itertools import chain
+from tempfile import TemporaryFile
+
+from .cache import MetadataCache
+from .drivers.utils import chunks, span, Entry
+
+# Leading bytes of formats which are compressed already, compressing them again only costs CPU
+MAGIC = (
+    b'\x1f\x8b',  # gzip
+    b'\x28\xb5\x2f\xfd',  # zstd
+    b'\xfd7zXZ\x00',  # xz
+    b'BZh',  # bzip2
+    b'PK\x03\x04',  # zip, docx, jar
+    b'7z\xbc\xaf\x27\x1c',  # 7z
+    b'Rar!',  # rar
+    b'\x89PNG',  # png
+    b'\xff\xd8\xff',  # jpeg
+    b'GIF8',  # gif
+)
+
+EXTENSIONS = ('.gz', '.tgz', '.zst', '.xz', '.bz2', '.zip', '.7z', '.rar', '.png', '.jpg', '.jpeg', '.gif',
+              '.webp', '.mp3', '.mp4', '.mkv', '.avi', '.mov', '.ogg', '.flac', '.woff', '.woff2')
+
+
+def _zlib(wbits):
+    def compressor(level):
+        return zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, wbits)
+
+    def decompressor():
+        return zlib.decompressobj(wbits)
+
+    return compressor, decompressor
+
+
+def _zstd():
+    # zstandard is optional, without it zstd disks use gzip
+    import zstandard
+
+    def compressor(level):
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+
+    def decompressor():
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    return compressor, decompressor
+
+
+# Compressed files are stored with the marker before the codec suffix, eg. log.txt.diskpy.gz,
+# so files put as is, like archive.tar.gz, are never taken for them
+MARK = '.diskpy'
+
+CODECS = {
+    'gzip': ('.gz', lambda: _zlib(31)),
+    'zlib': ('.zz', lambda: _zlib(15)),
+    'zstd': ('.zst', _zstd)
+}
+
+
+class Compression:
+    """ Compression class compress files on the storage
+
+    Wrap a driver, put compresses the content and get decompresses it while streaming.
+    Compressed files are stored with ``.diskpy`` and the codec suffix (``.gz``, ``.zz``, ``.zst``), content which
+    is compressed already is stored as is, listings show the names without the suffix.
+    The stored name of each file is remembered, so calls after put or the first read skip the exist probe.
+    """
+
+    def __init__(self, driver, codec='gzip', level=None, chunk_size=65536, spool_size=8 * 1024 * 1024):
+        """Init Compression object
+
+        Args:
+            driver (object): the driver to wrap.
+            codec (optional[str]): gzip, zlib or zstd, zstd needs zstandard package, gzip is used without it.
+            level (optional[int]): compression level, if is none will use the codec default.
+            chunk_size (optional[int]): size of each chunk read from the content.
+            spool_size (optional[int]): max compressed bytes kept in memory on put, more go to temporary file.
+
+        Returns:
+            Compression class object
+        """
+        if codec not in CODECS:
+            raise ValueError('Unknown codec: ' + str(codec))
+
+        try:
+            self.compressor, self.decompressor = CODECS[codec][1]()
+        except ImportError:
+            codec = 'gzip'
+            self.compressor, self.decompressor = CODECS[codec][1]()
+
+        self.driver = driver
+        self.codec = codec
+        self.suffix = MARK + CODECS[codec][0]
+        self.level = level
+        self.chunk_size = chunk_size
+        self.spool_size = spool_size
+        self.names = MetadataCache(ttl=300, size=4096)
+
+        # Text mode of FTP breaks compressed data
+        inner = driver
+
+        while 'driver' in vars(inner):
+            inner = vars(inner)['driver']
+
+        self.binary = 'binary' in signature(inner.put).parameters
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def put(self, filename, content=None, **kwargs):
+        """Put file to the storage
+
+        The first chunk decides, content starting with a compressed format header or file with compressed
+        format extension is put as is. The other copy of the file is deleted, so get never reads stale content.
+        Compressed content is handed to the driver as bytes, or as temporary file above ``spool_size``,
+        so the driver knows its size and small files are sent in one request. FTP always writes in binary mode.
+        """
+        position = _position(content)
+        spooled = None
+        blocks = chunks(content, self.chunk_size)
+        first = next(blocks, b'')
+        blocks = chain([first], blocks)
+
+        if filename.lower().endswith(EXTENSIONS) or first.startswith(MAGIC):
+            name, other = filename, filename + self.suffix
+
+            # The driver reads content it can read again itself, generators go on as they are
+            if position is not None:
+                content.seek(position)
+            elif not isinstance(content, (str, bytes)):
+                content = blocks
+        else:
+            name, other = filename + self.suffix, filename
+            content = spooled = self.__spool(self.__compress(blocks))
+
+        if self.binary:
+            kwargs['binary'] = True
+
+        cached, stored = self.names.get(('stored', (filename,)))
+        self.names.invalidate([filename])
+
+        try:
+            result = self.driver.put(name, content, **kwargs)
+        finally:
+            if hasattr(spooled, 'close'):
+                spooled.close()
+
+        if result:
+            # The other copy can only be there if the file was not stored under this name already
+            if not (cached and stored == name) and self.driver.exist(other):
+                self.driver.delete(other)
+
+            self.__remember(filename, name)
+
+        return result
+
+    def get(self, filename, save_to=None, offset=None, length=None, **kwargs):
+        """Get file from the storage
+
+        Byte ranges of files stored as is are read with the driver range reads, compressed files are
+        decompressed from the start up to the range.
+
+        Returns:
+            bytes: the content of the file.
+            bool: True if saved to save_to, False otherwise.
+        """
+        if offset is not None or length is not None:
+            name = self.__stored(filename)
+
+            if name == filename:
+                return self.driver.get(name, save_to, offset=offset, length=length, **kwargs)
+
+            content = self.__slice(self.iter_get(filename, self.chunk_size, **kwargs), offset, length)
+        else:
+            content = self.iter_get(filename, self.chunk_size, **kwargs)
+
+        if content is False:
+            return False
+
+        if save_to is None:
+            return b''.join(content)
+
+        with open(save_to, 'wb') as f:
+            for chunk in content:
+                f.write(chunk)
+
+        return True
+
+    def iter_get(self, filename, chunk_size=65536, **kwargs):
+        name = self.__stored(filename)
+        content = self.driver.iter_get(name, chunk_size, **kwargs)
+
+        if content is False:
+            # The remembered name is stale if the file was put by another process
+            other = self.__stored(filename, fresh=True)
+
+            if other == name:
+                return False
+
+            name = other
+            content = self.driver.iter_get(name, chunk_size, **kwargs)
+
+        if content is False or name == filename:
+            return content
+
+        return self.__decompress(content)
+
+    def delete(self, filename, **kwargs):
+        name = self.__stored(filename)
+        self.names.invalidate([filename])
+        return self.driver.delete(name, **kwargs)
+
+    def delete_many(self, filenames, **kwargs):
+        names = {self.__stored(f): f for f in filenames}
+        self.names.invalidate(names.values())
+        results = self.driver.delete_many(list(names), **kwargs)
+        return {names[name]: result for name, result in results.items()}
+
+    def copy(self, filename, destination, **kwargs):
+        name = self.__stored(filename)
+        self.names.invalidate([destination])
+        return self.driver.copy(name, destination + name[len(filename):], **kwargs)
+
+    def move(self, filename, destination, **kwargs):
+        name = self.__stored(filename)
+        self.names.invalidate([filename, destination])
+        return self.driver.move(name, destination + name[len(filename):], **kwargs)
+
+    def exist(self, filename, **kwargs):
+        if filename.lower().endswith(EXTENSIONS):
+            return self.driver.exist(filename, **kwargs)
+
+        return self.driver.exist(filename + self.suffix, **kwargs) or self.driver.exist(filename, **kwargs)
+
+    def size(self, filename, **kwargs):
+        """File size
+
+        Size of compressed file is counted by decompressing it, the whole file is downloaded.
+        """
+        name = self.__stored(filename)
+
+        if name == filename:
+            size = self.driver.size(name, **kwargs)
+
+            if size is not False or self.__stored(filename, fresh=True) == name:
+                return size
+
+        content = self.iter_get(filename, self.chunk_size)
+        return sum(len(chunk) for chunk in content) if content is not False else False
+
+    def permissions(self, filename, **kwargs):
+        if not hasattr(self.driver, 'permissions'):
+            return False
+
+        return self.driver.permissions(self.__stored(filename), **kwargs)
+
+    def files(self, directory=None, prefix=None, suffix=None, **kwargs):
+        """Files List
+
+        List the files of the driver, the codec suffix is removed from names before matching suffix.
+        Sizes of recursive entries are the stored sizes.
+        """
+        listing = self.driver.files(directory, prefix, None, **kwargs)
+
+        if listing is False:
+            return False
+
+        files = (self.__logical(f) for f in listing)
+
+        if suffix is not None:
+            files = (f for f in files if self.__name(f).endswith(suffix))
+
+        # Keep the listing type of the driver, list or generator
+        return list(files) if isinstance(listing, list) else files
+
+    @staticmethod
+    def __slice(content, offset, length):
+        if content is False:
+            return False
+
+        # The tail needs the size, which is known only at the end
+        if offset is not None and offset < 0:
+            content = b''.join(content)
+            start, end = span(len(content), offset, length)
+            return [content[start:end]]
+
+        return _slice(content, offset or 0, length)
+
+    def __stored(self, filename, fresh=False):
+        # Files with compressed format extension are always put as is
+        if filename.lower().endswith(EXTENSIONS):
+            return filename
+
+        cached, name = self.names.get(('stored', (filename,)))
+
+        if not cached or fresh:
+            name = filename + self.suffix if self.driver.exist(filename + self.suffix) else filename
+            self.__remember(filename, name)
+
+        return name
+
+    def __remember(self, filename, name):
+        self.names.set(('stored', (filename,)), name)
+
+    def __logical(self, f):
+        name = self.__name(f)
+
+        if not name.endswith(self.suffix):
+            return f
+
+        name = name[:-len(self.suffix)]
+
+        if isinstance(f, str):
+            return name
+
+        if isinstance(f, Entry):
+            return f._replace(name=name)
+
+        # Dropbox metadata
+        f.name = name
+        return f
+
+    @staticmethod
+    def __name(f):
+        return f if isinstance(f, str) else f.name
+
+    def __spool(self, content):
+        size = 0
+        head = []
+
+        for chunk in content:
+            head.append(chunk)
+            size += len(chunk)
+
+            if size > self.spool_size:
+                file = TemporaryFile()
+                file.writelines(head)
+
+                for chunk in content:
+                    file.write(chunk)
+
+                file.seek(0)
+                return file
+
+        return b''.join(head)
+
+    def __compress(self, content):
+        compressor = self.compressor(self.level)
+
+        for chunk in content:
+            chunk = compressor.compress(chunk)
+
+            if chunk:
+                yield chunk
+
+        yield compressor.flush()
+
+    def __decompress(self, content):
+        decompressor = self.decompressor()
+
+        for chunk in content:
+            chunk = decompressor.decompress(chunk)
+
+            if chunk:
+                yield chunk
+
+        if hasattr(decompressor, 'flush'):
+            chunk = decompressor.flush()
+
+            if chunk:
+                yield chunk
+
+
+def _slice(content, start, length):
+    position = 0
+
+    for chunk in content:
+        end = position + len(chunk)
+
+        if end > start:
+            chunk = chunk[max(0, start - position):]
+
+            if length is not None:
+                chunk = chunk[:start + length - max(position, start)]
+
+            if chunk:
+                yield chunk
+
+        position = end
+
+        if length is not None and position >= start + length:
+            content.close()
+            break
+
+
+def _position(content):
+    """Position of seekable file content, None for other content"""
+    try:
+        return content.tell() if content.seekable() else None
+    except (AttributeError, OSError, ValueError):
+        return None
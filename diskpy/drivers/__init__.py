@@ -1,4 +1,18 @@
-from .local import Local
-from .s3 import S3
-from .ftp import FTP
-from .dropbox import Dropbox
+from importlib import import_module
+
+__all__ = ['Local', 'S3', 'FTP', 'Dropbox']
+
+_modules = {
+    'Local': '.local',
+    'S3': '.s3',
+    'FTP': '.ftp',
+    'Dropbox': '.dropbox',
+}
+
+
+def __getattr__(name):
+    """Import the driver module on first access"""
+    if name in _modules:
+        return getattr(import_module(_modules[name], __name__), name)
+
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
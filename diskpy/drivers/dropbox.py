@@ -1,6 +1,25 @@
-from dropbox import Dropbox as Box
-from dropbox.files import WriteMode, FolderMetadata
-from dropbox.exceptions import *
+import calendar
+import time
+from threading import Lock
+
+from .utils import parts, is_large, batches, byte_range, span, record, Entry, Recorder
+
+# The Dropbox SDK is imported when the first Dropbox driver is built
+Box = None
+ApiError = None
+requests = RequestException = None
+WriteMode = FolderMetadata = CommitInfo = UploadSessionCursor = DeleteArg = None
+
+
+def _import():
+    global Box, ApiError, WriteMode, FolderMetadata, CommitInfo, UploadSessionCursor, DeleteArg
+    global requests, RequestException
+
+    import requests
+    from requests import RequestException
+    from dropbox import Dropbox as Box
+    from dropbox.exceptions import ApiError
+    from dropbox.files import WriteMode, FolderMetadata, CommitInfo, UploadSessionCursor, DeleteArg
 
 
 class Dropbox:
@@ -10,7 +29,9 @@ class Dropbox:
     """
     setting = {
         'base': '/',
-        'access_token': 'your_access_token'
+        'access_token': 'your_access_token',
+        'chunk_size': 8 * 1024 * 1024,
+        'session_threshold': 128 * 1024 * 1024
     }
 
     def __init__(self, setting):
@@ -24,20 +45,36 @@ class Dropbox:
         Returns:
             Dropbox class object
         """
-        self.setting.update(setting)
+        _import()
+
+        self.setting = dict(self.setting, **setting)
         self.base = (self.setting.get('base') + '/').lower()
-        self.client = Box(self.setting.get('access_token'))
-        self.client.users_get_current_account()
+        self.__client = None
+        self.__lock = Lock()
+
+    @property
+    def client(self):
+        """Dropbox client, created on first use"""
+        if self.__client is None:
+            with self.__lock:
+                if self.__client is None:
+                    self.__client = Recorder(Box(self.setting.get('access_token')))
 
-    def put(self, filename, content=None, overwrite=True):
+        return self.__client
+
+    def put(self, filename, content=None, overwrite=True, session=None):
         """Put file to the storage
 
-        Create file in the storage and put the content on it, Content can be text, file handler or empty.
+        Create file in the storage and put the content on it, Content can be text, file handler, generator or empty.
+
+        Generators and files larger than the ``session_threshold`` setting are streamed with an upload session
+        in chunks of ``chunk_size`` setting, so they are never loaded fully in memory.
 
         Args:
             filename (str): the name of the file to create.
-            content (optional[str|file]): the content to put in file.
+            content (optional[str|file|generator]): the content to put in file.
             overwrite (optional[boolean]): overwrite if exist
+            session (optional[boolean]): force or disable upload session, if is none will decide by content size.
 
         Returns:
             bool: True if successful, False otherwise.
@@ -47,20 +84,71 @@ class Dropbox:
             disk.put('filename.txt', 'some text')
             disk.put('filename.txt', open('file.txt'))
             disk.put('filename.txt', open('file.txt'), overwrite=true)
+            disk.put('video.mp4', open('video.mp4', 'rb'), session=True)
         """
         if content is None:
             content = ''
 
         mode = WriteMode.overwrite if overwrite else WriteMode.add
 
+        if session is None:
+            session = is_large(content, self.setting.get('session_threshold'))
+
         try:
-            self.client.files_upload(content, self.base + filename, mode=mode)
+            if session:
+                self.__put_session(self.base + filename, content, mode)
+            else:
+                self.client.files_upload(content, self.base + filename, mode=mode)
             return True
         except ApiError:
             return False
 
-    def get(self, filename, save_to=None):
+    def __put_session(self, path, content, mode):
+        session_id = self.client.files_upload_session_start(b'').session_id
+        cursor = UploadSessionCursor(session_id, 0)
+        previous = None
+
+        # Hold one chunk back, the last one has to be sent with finish
+        for chunk in parts(content, self.setting.get('chunk_size')):
+            if previous is not None:
+                self.client.files_upload_session_append_v2(previous, cursor)
+                cursor.offset += len(previous)
+
+            previous = chunk
+
+        self.client.files_upload_session_finish(previous, cursor, CommitInfo(path, mode=mode))
+
+    def get(self, filename, save_to=None, offset=None, length=None):
+        """Get file from the storage
+
+        Return the content of the file.
+        With offset or length only the byte range is downloaded, from temporary link of the file with the Range
+        header, so it costs one more request.
+
+        Args:
+            filename (str): the name of the file to get.
+            save_to (optional[str]): file path to save copy of the file there.
+            offset (optional[int]): first byte to download, negative counts from the end of the file.
+            length (optional[int]): max number of bytes to download.
+
+        Returns:
+            bytes: the content of the file, False otherwise.
+
+        Examples:
+            disk.get('filename.txt')
+            disk.get('filename.txt', save_to='path/to/file.txt')
+            disk.get('archive.zip', offset=-65536)
+        """
         try:
+            if offset is not None or length is not None:
+                content = self.__get_range(self.base + filename, offset, length)
+
+                if save_to is not None:
+                    with open(save_to, 'wb') as f:
+                        f.write(content)
+
+                return content
+
             md, res = self.client.files_download(self.base + filename)
 
             if save_to is not None:
@@ -69,9 +157,87 @@ class Dropbox:
                     f.close()
 
             return res.content
+        except (ApiError, RequestException):
+            return False
+
+    def __get_range(self, path, offset, length):
+        header = byte_range(offset, length)
+
+        if header is None:
+            return b''
+
+        link = self.client.files_get_temporary_link(path).link
+
+        try:
+            res = requests.get(link, headers={'Range': header}, timeout=60)
+
+            # Range starts after the end of the file
+            if res.status_code == 416:
+                return b''
+
+            res.raise_for_status()
+        except RequestException as e:
+            record(e)
+            raise
+
+        if res.status_code == 206:
+            return res.content if length is None else res.content[:length]
+
+        # The whole file was sent
+        start, end = span(len(res.content), offset, length)
+        return res.content[start:end]
+
+    def iter_get(self, filename, chunk_size=65536):
+        """Iterate file from the storage
+
+        Read the download response stream in chunks so the whole file never loaded in memory.
+
+        Args:
+            filename (str): the name of the file to get.
+            chunk_size (optional[int]): max size of each chunk in bytes.
+
+        Returns:
+            generator: yields bytes chunks of the file.
+            bool: False if failed to get the file.
+
+        Examples:
+            for chunk in disk.iter_get('filename.txt'):
+                print(chunk)
+        """
+        try:
+            md, res = self.client.files_download(self.base + filename)
         except ApiError:
             return False
 
+        return _chunks(res, chunk_size)
+
+    def get_if_changed(self, filename, revision=None, chunk_size=65536):
+        """Get file from the storage if changed
+
+        Compare the file rev with the known revision and download the file only if it is different.
+
+        Args:
+            filename (str): the name of the file to get.
+            revision (optional[str]): rev of the copy the caller has.
+            chunk_size (optional[int]): max size of each chunk in bytes.
+
+        Returns:
+            tuple: (rev, generator of bytes chunks), generator is None if not changed.
+            bool: False if failed.
+
+        Examples:
+            rev, chunks = disk.get_if_changed('filename.txt', revision=rev)
+        """
+        try:
+            if revision is not None and self.client.files_get_metadata(self.base + filename).rev == revision:
+                return revision, None
+
+            md, res = self.client.files_download(self.base + filename)
+        except ApiError:
+            return False
+
+        return md.rev, _chunks(res, chunk_size)
+
     def delete(self, filename):
         try:
             self.client.files_delete(self.base + filename)
@@ -79,6 +245,45 @@ class Dropbox:
         except ApiError:
             return False
 
+    def delete_many(self, filenames, poll_interval=0.5):
+        """Delete many files from the storage
+
+        Send the paths in batches of 1000 per files_delete_batch request and poll the async job.
+
+        Args:
+            filenames (list|generator): the names of the files to delete.
+            poll_interval (optional[float]): seconds to wait between checking the job status.
+
+        Returns:
+            dict: filename as key, True if deleted, False otherwise.
+
+        Examples:
+            disk.delete_many(['filename1.txt', 'filename2.txt'])
+        """
+        results = {}
+
+        for batch in batches(filenames, 1000):
+            try:
+                job = self.client.files_delete_batch([DeleteArg(self.base + f) for f in batch])
+
+                if job.is_async_job_id():
+                    job_id = job.get_async_job_id()
+                    job = self.client.files_delete_batch_check(job_id)
+
+                    while job.is_in_progress():
+                        time.sleep(poll_interval)
+                        job = self.client.files_delete_batch_check(job_id)
+
+                if job.is_complete():
+                    entries = job.get_complete().entries
+                    results.update((f, e.is_success()) for f, e in zip(batch, entries))
+                else:
+                    results.update((f, False) for f in batch)
+            except ApiError:
+                results.update((f, False) for f in batch)
+
+        return results
+
     def copy(self, filename, destination):
         try:
             self.client.files_copy(self.base + filename, self.base + destination)
@@ -100,40 +305,90 @@ class Dropbox:
         except ApiError:
             return False
 
-    def files(self, directory=None, prefix=None, suffix=None):
-        directory = self.base[:-1] if directory is None else self.base + directory
-        files = []
+    def size(self, filename):
         try:
-            files = [e for e in self.client.files_list_folder(directory).entries if not isinstance(e, FolderMetadata)]
+            return self.client.files_get_metadata(self.base + filename).size
+        except ApiError:
+            return False
 
-            if prefix is not None:
-                files = [f for f in files if f.name.startswith(prefix)]
+    def files(self, directory=None, prefix=None, suffix=None, recursive=False):
+        """Files List
 
-            if suffix is not None:
-                files = [f for f in files if f.name.endswith(suffix)]
+        Lazily list all files inside the selected folder, following the listing cursor.
 
-        except ApiError:
-            pass
+        Args:
+            directory (optional[str]): the folder to look in it.
+            prefix (optional[str]): a str files names start with.
+            suffix (optional[str]): a str files names ends with.
+            recursive (optional[boolean]): yield Entry(name, size, mtime, etag) of files in sub folders too,
+                etag is the Dropbox content hash.
+
+        Returns:
+            generator: yields metadata of folder's files as each page arrives, if recursive raises ApiError
+                if a page fails, so an incomplete listing never looks complete.
+
+        Examples:
+            for f in disk.files('sub_folder', prefix='log', suffix='.txt'):
+                print(f.name)
 
-        return files
+            for entry in disk.files('sub_folder', recursive=True):
+                print(entry.name, entry.size, entry.mtime, entry.etag)
+        """
+        folder = self.base if directory is None else self.base + directory + '/'
+
+        for e in self.__list(directory, recursive):
+            if isinstance(e, FolderMetadata) or not self.__match(e.name, prefix, suffix):
+                continue
+
+            if recursive:
+                mtime = calendar.timegm(e.server_modified.utctimetuple())
+                yield Entry(e.path_display[len(folder):], e.size, mtime, e.content_hash)
+            else:
+                yield e
 
     def dirs(self, directory=None, prefix=None, suffix=None):
+        """Directories List
+
+        Lazily list all directories inside the selected folder, following the listing cursor.
+
+        Args:
+            directory (optional[str]): the folder to look in it.
+            prefix (optional[str]): a str directories names start with.
+            suffix (optional[str]): a str directories names ends with.
 
+        Returns:
+            generator: yields metadata of folder's directories as each page arrives.
+
+        Examples:
+            for d in disk.dirs('sub_folder'):
+                print(d.name)
+        """
+        for e in self.__list(directory):
+            if isinstance(e, FolderMetadata) and self.__match(e.name, prefix, suffix):
+                yield e
+
+    def __list(self, directory, recursive=False):
         directory = self.base[:-1] if directory is None else self.base + directory
-        files = []
 
         try:
-            files = [e for e in self.client.files_list_folder(directory).entries if isinstance(e, FolderMetadata)]
+            result = self.client.files_list_folder(directory, recursive=recursive)
+
+            while True:
+                for e in result.entries:
+                    yield e
 
-            if prefix is not None:
-                files = [f for f in files if f.name.startswith(prefix)]
+                if not result.has_more:
+                    break
 
-            if suffix is not None:
-                files = [f for f in files if f.name.endswith(suffix)]
+                result = self.client.files_list_folder_continue(result.cursor)
         except ApiError:
-            pass
+            # Recursive listings feed sync, which deletes what they miss
+            if recursive:
+                raise
 
-        return files
+    @staticmethod
+    def __match(name, prefix, suffix):
+        return (prefix is None or name.startswith(prefix)) and (suffix is None or name.endswith(suffix))
 
     def make_dir(self, directory):
         try:
@@ -146,3 +401,10 @@ class Dropbox:
         return self.delete(directory)
 
 
+def _chunks(res, chunk_size):
+    """Read download response in chunks and close it"""
+    try:
+        for chunk in res.iter_content(chunk_size):
+            yield chunk
+    finally:
+        res.close()
@@ -1,4 +1,126 @@
-from ftplib import FTP as CLIENT, Error
+import calendar
+import posixpath
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from ftplib import FTP as CLIENT, Error, error_perm, error_temp, error_reply, parse227
+from io import BufferedReader
+from queue import Queue, LifoQueue, Full, Empty
+from tempfile import SpooledTemporaryFile
+from threading import Thread, Event, BoundedSemaphore
+from weakref import finalize
+
+from .utils import chunks, span, ChunkReader, Entry, record
+
+
+class _TransferAborted(Exception):
+    pass
+
+
+class _Pool:
+    """ Pool of logged in FTP connections.
+
+    At most ``size`` connections are open, idle connections are checked with NOOP before reuse.
+    """
+
+    def __init__(self, connect, size, keepalive):
+        """Init Pool object
+
+        Args:
+            connect (callable): create new logged in connection.
+            size (int): max number of open connections.
+            keepalive (int): seconds a connection can be idle before checking it with NOOP.
+
+        Returns:
+            _Pool class object
+        """
+        self.connect = connect
+        self.keepalive = keepalive
+        self.idle = LifoQueue()
+        self.slots = BoundedSemaphore(size)
+
+    def checkout(self, blocking=True):
+        if not self.slots.acquire(blocking):
+            return None
+
+        try:
+            while True:
+                try:
+                    client, used = self.idle.get_nowait()
+                except Empty:
+                    return self.connect()
+
+                if time.monotonic() - used < self.keepalive:
+                    return client
+
+                try:
+                    client.voidcmd('NOOP')
+                    return client
+                except (Error, OSError, EOFError):
+                    # Stale session, drop it and try the next one
+                    self.__close(client)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def checkin(self, client, broken=False):
+        if client.sock is None:
+            # Closed by the caller, its session was left in unknown state
+            pass
+        elif broken:
+            self.__close(client)
+        else:
+            self.idle.put((client, time.monotonic()))
+
+        self.slots.release()
+
+    @contextmanager
+    def connection(self, blocking=True):
+        """Connection of the pool
+
+        Args:
+            blocking (optional[boolean]): wait for free connection, if is false yields None when all are in use.
+        """
+        try:
+            client = self.checkout(blocking)
+        except Exception as e:
+            record(e)
+            raise
+
+        if client is None:
+            yield None
+            return
+
+        broken = False
+
+        try:
+            yield client
+        except error_perm as e:
+            # Permanent errors like missing file leave the session usable
+            record(e)
+            raise
+        except BaseException as e:
+            broken = True
+            record(e)
+            raise
+        finally:
+            self.checkin(client, broken)
+
+    def close(self):
+        while True:
+            try:
+                client, used = self.idle.get_nowait()
+            except Empty:
+                break
+
+            self.__close(client)
+
+    @staticmethod
+    def __close(client):
+        try:
+            client.quit()
+        except (Error, OSError, EOFError):
+            client.close()
 
 
 class FTP:
@@ -6,13 +128,15 @@ class FTP:
 
     Do most needed storage functions like put file, create directory.. eg.
     """
-    downloaded = ''
     setting = {
         'base': '/',
         'host': 'website.com',
-        'port': '2121',
+        'port': 21,
         'username': 'user',
         'password': 'secret',
+        'pool_size': 4,
+        'keepalive': 60,
+        'fxp': False,
     }
 
     def __init__(self, setting):
@@ -28,19 +152,30 @@ class FTP:
         """
         # TODO : SFTP
         # TODO : Handling the difference between ascii and binary
-        self.setting.update(setting)
-        self.client = CLIENT(self.setting.get('host'))
-        self.client.login(self.setting.get('username'), self.setting.get('password'))
-        self.client.cwd(self.setting.get('base'))
+        self.setting = dict(self.setting, **setting)
+        # Connections are opened on first use
+        self.pool = _Pool(self.__connect, self.setting.get('pool_size'), self.setting.get('keepalive'))
+
+    def __connect(self):
+        client = CLIENT()
+        client.connect(self.setting.get('host'), int(self.setting.get('port')))
+        client.login(self.setting.get('username'), self.setting.get('password'))
+        client.cwd(self.setting.get('base'))
+        return client
+
+    def close(self):
+        """Close all idle connections"""
+        self.pool.close()
 
     def put(self, filename, content=None, binary=False):
         """Put file to the storage
 
-        Create file in the storage and put the content on it, Content can be text, file handler or empty.
+        Create file in the storage and put the content on it, Content can be text, bytes, file handler,
+        generator of chunks or empty.
 
         Args:
             filename (str): the name of the file to create.
-            content (optional[str|file]): the content to put in file.
+            content (optional[str|bytes|file|generator]): the content to put in file.
             binary (optional[boolean]): use binary mode
 
         Returns:
@@ -52,21 +187,71 @@ class FTP:
             disk.put('filename.txt', open('file.txt'))
             disk.put('filename.txt', open('img.png'), binary=true)
         """
-        if not hasattr(content, 'read'):
-            import io
-            content = io.BytesIO(content.encode())
+        # Any content is read as bytes file, storlines needs readline so it is buffered
+        content = BufferedReader(ChunkReader(chunks(content)))
 
         try:
-            if binary:
-                self.client.storbinary("STOR " + filename, content, len(content))
-            else:
-                self.client.storlines("STOR " + filename, content)
+            with self.pool.connection() as client:
+                try:
+                    self.__store(client, filename, content, binary)
+                except error_perm:
+                    # STOR is refused before any content is read, create the missing folders and try again
+                    if not posixpath.dirname(filename):
+                        raise
+
+                    self.__make_parents(client, posixpath.dirname(filename))
+                    self.__store(client, filename, content, binary)
             return True
         except Error as e:
             print('Put:', e)
             return False
 
-    def get(self, filename, save_to=None, callback=None, binary=False):
+    @staticmethod
+    def __store(client, filename, content, binary):
+        if binary:
+            client.storbinary("STOR " + filename, content)
+        else:
+            client.storlines("STOR " + filename, content)
+
+    @staticmethod
+    def __make_parents(client, directory):
+        path = ''
+
+        for name in directory.split('/'):
+            path = posixpath.join(path, name) if path or name else '/'
+
+            try:
+                client.mkd(path)
+            except error_perm:
+                pass
+
+    def get(self, filename, save_to=None, callback=None, binary=False, offset=None, length=None):
+        """Get file from the storage
+
+        Pass the content to callback and save_to while it is received.
+        With offset or length only the byte range is transferred, RETR starts at the offset with REST and the data
+        connection is closed after length bytes.
+
+        Args:
+            filename (str): the name of the file to get.
+            save_to (optional[str]): file path to save copy of the file there.
+            callback (optional[callable]): receive each block or line of the file.
+            binary (optional[boolean]): use binary mode
+            offset (optional[int]): first byte to get, negative counts from the end of the file.
+            length (optional[int]): max number of bytes to get.
+
+        Returns:
+            bool: True if successful, False otherwise.
+            bytes: the content of the byte range.
+
+        Examples:
+            disk.get('filename.txt', callback=print)
+            disk.get('img.png', save_to='path/to/img.png', binary=True)
+            disk.get('archive.zip', offset=-65536)
+        """
+        if offset is not None or length is not None:
+            return self.__get_range(filename, save_to, offset, length)
+
         try:
             save_file = open(save_to, 'wb' if binary else 'w') if save_to is not None else None
 
@@ -77,10 +262,11 @@ class FTP:
                 if save_file is not None:
                     save_file.write(content)
 
-            if binary:
-                self.client.retrbinary("RETR " + filename, done)
-            else:
-                self.client.retrlines("RETR " + filename, done)
+            with self.pool.connection() as client:
+                if binary:
+                    client.retrbinary("RETR " + filename, done)
+                else:
+                    client.retrlines("RETR " + filename, done)
 
             return True
 
@@ -88,28 +274,290 @@ class FTP:
             print('Get:', e)
             return False
 
+    def __get_range(self, filename, save_to, offset, length):
+        try:
+            with self.pool.connection() as client:
+                client.voidcmd('TYPE I')
+                start = 0 if offset is None else offset
+                end = None if length is None else start + length
+
+                # The first byte of the tail depends on the size
+                if start < 0:
+                    start, end = span(client.size(filename), offset, length)
+
+                try:
+                    content = self.__retrieve(client, filename, start, end) if end is None or end > start else b''
+                except error_perm:
+                    # Servers refuse to start past the end, the range is empty like on the other drivers
+                    if start <= 0 or start < client.size(filename):
+                        raise
+
+                    content = b''
+        except Error as e:
+            print('Get:', e)
+            return False
+
+        if save_to is not None:
+            with open(save_to, 'wb') as f:
+                f.write(content)
+
+        return content
+
+    @staticmethod
+    def __retrieve(client, filename, start, end):
+        content = []
+        size = 0
+
+        with client.transfercmd('RETR ' + filename, rest=start or None) as conn:
+            while end is None or size < end - start:
+                block = conn.recv(65536 if end is None else min(65536, end - start - size))
+
+                if not block:
+                    break
+
+                content.append(block)
+                size += len(block)
+
+        try:
+            client.voidresp()
+        except (error_temp, error_reply):
+            # Closing the data connection before the end aborts the transfer, the session stays usable
+            pass
+
+        return b''.join(content)
+
+    def iter_get(self, filename, chunk_size=65536, queue_size=8):
+        """Iterate file from the storage
+
+        Run RETR in a background thread and hand the received blocks over a bounded queue,
+        so at most ``queue_size`` chunks are held in memory.
+
+        Args:
+            filename (str): the name of the file to get.
+            chunk_size (optional[int]): max size of each chunk in bytes.
+            queue_size (optional[int]): max number of chunks waiting to be consumed.
+
+        Returns:
+            generator: yields bytes chunks of the file, raises the transfer error if it breaks while iterating.
+            bool: False if failed to get the file.
+
+        Examples:
+            for chunk in disk.iter_get('filename.txt'):
+                print(chunk)
+        """
+        blocks = Queue(queue_size)
+        stop = Event()
+        done = object()
+        failed = object()
+        errors = []
+
+        def put(block):
+            while not stop.is_set():
+                try:
+                    blocks.put(block, timeout=1)
+                    return
+                except Full:
+                    pass
+
+            raise _TransferAborted()
+
+        def retrieve():
+            end = done
+
+            try:
+                # An aborted transfer leaves a pending reply, the pool drops that connection
+                with self.pool.connection() as client:
+                    client.retrbinary("RETR " + filename, put, blocksize=chunk_size)
+            except _TransferAborted:
+                pass
+            except (Error, OSError, EOFError) as e:
+                print('Iter Get:', e)
+                errors.append(e)
+                end = failed
+            finally:
+                try:
+                    put(end)
+                except _TransferAborted:
+                    pass
+
+        def generate(block):
+            try:
+                while block is not done:
+                    # The transfer broke after the first block, the content is incomplete
+                    if block is failed:
+                        raise errors[0]
+
+                    yield block
+                    block = blocks.get()
+            finally:
+                stop.set()
+                thread.join()
+
+        thread = Thread(target=retrieve, daemon=True)
+        thread.start()
+
+        # Wait for the first block, so a missing file is reported before iterating
+        first = blocks.get()
+
+        if first is failed:
+            thread.join()
+            return False
+
+        content = generate(first)
+
+        # A generator dropped before it starts never runs its finally, stop the transfer when it is collected
+        finalize(content, stop.set)
+        return content
+
+    def get_if_changed(self, filename, revision=None, chunk_size=65536):
+        """Get file from the storage if changed
+
+        FTP has no ETag, the revision is the modification time and size of the file.
+
+        Args:
+            filename (str): the name of the file to get.
+            revision (optional[str]): revision of the copy the caller has.
+            chunk_size (optional[int]): max size of each chunk in bytes.
+
+        Returns:
+            tuple: (revision, generator of bytes chunks), generator is None if not changed.
+            bool: False if failed.
+
+        Examples:
+            revision, chunks = disk.get_if_changed('filename.txt', revision=revision)
+        """
+        try:
+            with self.pool.connection() as client:
+                client.voidcmd('TYPE I')
+                current = client.sendcmd('MDTM ' + filename)[4:].strip() + ':' + str(client.size(filename))
+        except Error as e:
+            print('Get If Changed:', e)
+            return False
+
+        if current == revision:
+            return revision, None
+
+        content = self.iter_get(filename, chunk_size)
+        return (current, content) if content is not False else False
+
     def delete(self, filename):
         try:
-            self.client.delete(filename)
+            with self.pool.connection() as client:
+                client.delete(filename)
             return True
         except Error as e:
             print('Delete:', e)
             return False
 
-    def copy(self, filename, destination, binary=False):
-        try:
-            def callback(content):
-                self.downloaded += content + '\n'
+    def delete_many(self, filenames):
+        """Delete many files from the storage
+
+        Delete the files concurrently over ``pool_size`` setting connections.
+
+        Args:
+            filenames (list|generator): the names of the files to delete.
+
+        Returns:
+            dict: filename as key, True if deleted, False otherwise.
+
+        Examples:
+            disk.delete_many(['filename1.txt', 'filename2.txt'])
+        """
+        filenames = list(filenames)
+
+        with ThreadPoolExecutor(self.setting.get('pool_size')) as executor:
+            return dict(zip(filenames, executor.map(self.delete, filenames)))
+
+    def copy(self, filename, destination, binary=False, chunk_size=65536):
+        """Copy file from the storage
+
+        Stream the file between two data connections, RETR on one and STOR on the other, so the content
+        never held in memory. If ``fxp`` setting is enabled the server is asked to send the file to itself
+        (server to server FXP), falling back to streaming if the server refuses.
+
+        Args:
+            filename (str): the name of the file to copy.
+            destination (str): the name of the new file.
+            binary (optional[boolean]): kept for old calls, the content is always copied in binary mode.
+            chunk_size (optional[int]): size of each block sent to the new file.
+
+        Returns:
+            bool: True if successful, False otherwise.
 
-            self.get(filename, callback=callback, binary=binary)
-            return self.put(destination, content=self.downloaded, binary=binary)
+        Examples:
+            disk.copy('filename.txt', 'copy_of_filename.txt')
+        """
+        try:
+            if self.setting.get('fxp') and self.setting.get('pool_size') > 1:
+                try:
+                    if self.__copy_fxp(filename, destination):
+                        return True
+                except Error as e:
+                    print('FXP:', e)
+
+            self.__copy_stream(filename, destination, chunk_size)
+            return True
         except Error as e:
             print('Copy:', e)
             return False
 
+    def __copy_fxp(self, filename, destination):
+        # The second connection is not waited for, copies holding one connection each would wait forever
+        with self.pool.connection() as source, self.pool.connection(blocking=False) as target:
+            if target is None:
+                return False
+
+            source.voidcmd('TYPE I')
+            target.voidcmd('TYPE I')
+
+            # Target connects to source's passive port, data flows between the servers
+            target.sendport(*parse227(source.sendcmd('PASV')))
+            target.sendcmd('STOR ' + destination)
+
+            try:
+                source.sendcmd('RETR ' + filename)
+            except error_perm:
+                # Target still waits for the data, its session can't be reused
+                target.close()
+                raise
+
+            source.voidresp()
+            target.voidresp()
+
+        return True
+
+    def __copy_stream(self, filename, destination, chunk_size):
+        with self.pool.connection() as source, self.pool.connection(blocking=False) as target:
+            if target is None:
+                # A single connection can't read and write at once, go through a temporary file
+                with SpooledTemporaryFile(chunk_size * 16) as buffer:
+                    source.retrbinary('RETR ' + filename, buffer.write, blocksize=chunk_size)
+                    buffer.seek(0)
+                    source.storbinary('STOR ' + destination, buffer, blocksize=chunk_size)
+                return
+
+            source.voidcmd('TYPE I')
+
+            # transfercmd fails here if the file is missing, before the new file is created
+            conn = source.transfercmd('RETR ' + filename)
+
+            try:
+                with conn, conn.makefile('rb') as reader:
+                    target.storbinary('STOR ' + destination, reader, blocksize=chunk_size)
+            except error_perm:
+                # Read the reply of the aborted RETR, so the next command of the source gets its own reply
+                try:
+                    source.voidresp()
+                except (error_perm, error_temp, error_reply):
+                    pass
+                raise
+
+            source.voidresp()
+
     def move(self, filename, destination):
         try:
-            self.client.rename(filename, destination)
+            with self.pool.connection() as client:
+                client.rename(filename, destination)
             return True
         except Error as e:
             print('Move:', e)
@@ -117,51 +565,124 @@ class FTP:
 
     def exist(self, filename):
         try:
-            self.client.size(filename)
+            with self.pool.connection() as client:
+                client.size(filename)
             return True
         except Error as e:
             print('Exist:', e)
             return False
 
+    def size(self, filename):
+        try:
+            with self.pool.connection() as client:
+                client.voidcmd('TYPE I')
+                return client.size(filename)
+        except Error as e:
+            print('Size:', e)
+            return False
+
     def permissions(self, filename, chmod=None):
         try:
             if chmod is None:
                 # TODO : Get permissions
                 return ''
             else:
-                self.client.sendcmd('SITE CHMOD ' + str(chmod) + ' ' + filename)
+                with self.pool.connection() as client:
+                    client.sendcmd('SITE CHMOD ' + str(chmod) + ' ' + filename)
                 return True
 
         except Error as e:
             print('Permissions:', e)
             return False
 
-    def files(self, directory, prefix, suffix):
+    def files(self, directory=None, prefix=None, suffix=None, recursive=False):
+        """Files List
+
+        Get all files inside the selected folder, the path is listed directly without changing directory.
+
+        Args:
+            directory (optional[str]): the folder to look in it.
+            prefix (optional[str]): a str files names start with.
+            suffix (optional[str]): a str files names ends with.
+            recursive (optional[boolean]): walk sub folders with MLSD and yield Entry(name, size, mtime).
+
+        Returns:
+            list: a list of folder's files.
+            generator: if recursive, yields Entry with the path relative to the folder, raises the ftplib error
+                if a folder can't be listed, so an incomplete listing never looks complete.
+
+        Examples:
+            disk.files('sub_folder', prefix='log', suffix='.txt')
+
+            for entry in disk.files('sub_folder', recursive=True):
+                print(entry.name, entry.size, entry.mtime)
+        """
+        base = self.setting.get('base')
+        path = base if directory is None else posixpath.join(base, directory)
+
+        if recursive:
+            return self.__walk(path, prefix, suffix)
+
         files = []
 
         try:
-            if directory is not None:
-                self.client.cwd(directory)
+            with self.pool.connection() as client:
+                files = [posixpath.basename(f) for f in client.nlst(path)]
 
-            files = [f for f in self.client.nlst() if f != '.' and f != '..']
+            files = [f for f in files if f != '.' and f != '..']
 
             if prefix is not None:
-                files = [f for f in files if f.name.startswith(prefix)]
+                files = [f for f in files if f.startswith(prefix)]
 
             if suffix is not None:
-                files = [f for f in files if f.name.endswith(suffix)]
+                files = [f for f in files if f.endswith(suffix)]
 
         except Error as e:
             print('Files List:', e)
 
-        finally:
-            self.client.cwd(self.setting.get('base'))
-
         return files
 
+    def __walk(self, path, prefix, suffix):
+        stack = [(path, '')]
+
+        while stack:
+            folder, relative = stack.pop()
+
+            with self.pool.connection() as client:
+                entries = list(client.mlsd(folder, facts=['type', 'size', 'modify']))
+
+            for name, facts in entries:
+                kind, size, modify = facts.get('type'), facts.get('size'), facts.get('modify')
+                full = posixpath.join(folder, name)
+                matched = (prefix is None or name.startswith(prefix)) and (suffix is None or name.endswith(suffix))
+
+                # Servers may leave facts out, they are asked for with SIZE and MDTM then
+                if kind is None or (kind == 'file' and matched and (size is None or modify is None)):
+                    kind, size, modify = self.__stat(full)
+
+                if kind == 'dir':
+                    stack.append((full, relative + name + '/'))
+
+                elif kind == 'file' and matched:
+                    mtime = calendar.timegm(time.strptime(modify[:14], '%Y%m%d%H%M%S'))
+                    yield Entry(relative + name, int(size), mtime)
+
+    def __stat(self, path):
+        with self.pool.connection() as client:
+            client.voidcmd('TYPE I')
+
+            try:
+                size = client.size(path)
+            except error_perm:
+                # SIZE is refused for folders
+                return 'dir', None, None
+
+            return 'file', size, client.sendcmd('MDTM ' + path)[4:].strip()
+
     def make_dir(self, directory):
         try:
-            self.client.mkd(directory)
+            with self.pool.connection() as client:
+                client.mkd(directory)
             return True
         except Error as e:
             print('Make Dir:', e)
@@ -170,7 +691,8 @@ class FTP:
     def delete_dir(self, directory):
         # TODO : 550 Can't remove directory: Directory not empty
         try:
-            self.client.rmd(directory)
+            with self.pool.connection() as client:
+                client.rmd(directory)
             return True
         except Error as e:
             print('Delete Dir:', e)
@@ -1,4 +1,18 @@
+import mmap
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from threading import get_ident
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .utils import chunks, span, record, Entry
+
+# ioctl to clone file blocks (reflink) on Btrfs, XFS and OCFS2
+FICLONE = 0x40049409
 
 
 class Local:
@@ -7,7 +21,8 @@ class Local:
     Do most needed storage functions like put file, create directory.. eg.
     """
     setting = {
-        'base': 'files'
+        'base': 'files',
+        'concurrency': 8
     }
 
     def __init__(self, setting):
@@ -21,16 +36,18 @@ class Local:
         Returns:
             Local class object
         """
-        self.setting.update(setting)
+        self.setting = dict(self.setting, **setting)
 
     def put(self, filename, content=None):
         """Put file to the storage
 
-        Create file in the storage and put the content on it, Content can be text, file handler or empty.
+        Create file in the storage and put the content on it, Content can be text, bytes, file handler,
+        generator of chunks or empty. The content is written to a temporary file which replaces the file
+        at the end, so a failed stream never leaves a truncated file.
 
         Args:
             filename (str): the name of the file to create.
-            content (optional[str|file]): the content to put in file.
+            content (optional[str|bytes|file|generator]): the content to put in file.
 
         Returns:
             bool: True if successful, False otherwise.
@@ -40,49 +57,167 @@ class Local:
             disk.put('filename.txt', 'some text')
             disk.put('filename.txt', open('file.txt'))
         """
+        path = self.__base(filename)
+        folder, name = os.path.split(path)
+        temp = os.path.join(folder, '.%s.%d.%d.tmp' % (name, os.getpid(), get_ident()))
+
         try:
-            with open(self.__base(filename), 'w') as f:
-                if content is not None:
-                    if hasattr(content, 'read'):
-                        content = content.read()
+            os.makedirs(folder, exist_ok=True)
 
-                    f.write(content)
-                f.close()
+            with open(temp, 'xb') as f:
+                # Write in chunks, files and generators are never read fully in memory
+                for chunk in chunks(content):
+                    f.write(chunk)
+
+            # Keep the permissions of the replaced file
+            if os.path.exists(path):
+                shutil.copymode(path, temp)
+
+            os.replace(temp, path)
             return True
         except OSError as e:
             print('Put:', e)
+            record(e)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
 
         return False
 
-    def get(self, filename, save_to=None):
+    def get(self, filename, save_to=None, offset=None, length=None):
         """Get file from the storage
 
         Return the content of the file.
+        With offset or length only the byte range is read with pread, the rest of the file is never read.
 
         Args:
             filename (str): the name of the file to get.
             save_to (optional[str]): file path to save copy of the file there.
+            offset (optional[int]): first byte to read, negative counts from the end of the file.
+            length (optional[int]): max number of bytes to read.
 
         Returns:
-            bool: True if successful, False otherwise.
+            str: the content of the file.
+            bytes: the content of the byte range.
+            bool: True if saved to save_to, False otherwise.
 
         Examples:
             disk.get('filename.txt')
             disk.get('filename.txt', save_to='path/to/file.txt')
+
+            # Header and footer
+            disk.get('data.parquet', offset=0, length=4)
+            disk.get('data.parquet', offset=-65536)
         """
         try:
-            with open(self.__base(filename)) as file:
-                if save_to is not None:
-                    with open(save_to, 'w') as f:
-                        f.write(file.read())
-                        f.close()
+            if offset is not None or length is not None:
+                content = self.__get_range(filename, offset, length)
+
+                if save_to is None:
+                    return content
+
+                with open(save_to, 'wb') as f:
+                    f.write(content)
+                return True
 
+            if save_to is not None:
+                # Copied in kernel space, the content never read here
+                _copy_file(self.__base(filename), save_to)
+                return True
+
+            with open(self.__base(filename)) as file:
                 return file.read()
         except OSError as e:
             print('Get:', e)
+            record(e)
 
         return False
 
+    def __get_range(self, filename, offset, length):
+        with open(self.__base(filename), 'rb') as f:
+            start, end = span(os.fstat(f.fileno()).st_size, offset, length)
+            content = []
+
+            # pread reads at the offset without seeking, it may return less than asked
+            while start < end:
+                if hasattr(os, 'pread'):
+                    chunk = os.pread(f.fileno(), end - start, start)
+                else:
+                    f.seek(start)
+                    chunk = f.read(end - start)
+
+                if not chunk:
+                    break
+
+                content.append(chunk)
+                start += len(chunk)
+
+            return b''.join(content)
+
+    def open_mapped(self, filename, access='sequential'):
+        """Open mapped file from the storage
+
+        Map the file in memory and return read-only view of it, slicing the view does not copy the content.
+        The file is unmapped when the view is released and not used anymore.
+
+        Args:
+            filename (str): the name of the file to map.
+            access (optional[str]): madvise hint, can be sequential, random, normal, willneed.
+
+        Returns:
+            memoryview: read-only view of the file content.
+            bool: False if failed.
+
+        Examples:
+            view = disk.open_mapped('data.bin', access='random')
+            header = view[:64]
+            view.release()
+        """
+        try:
+            with open(self.__base(filename), 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    # Empty files can't be mapped
+                    return memoryview(b'')
+
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError as e:
+            print('Open Mapped:', e)
+            record(e)
+            return False
+
+        advice = getattr(mmap, 'MADV_' + access.upper(), None)
+
+        if advice is not None and hasattr(mapped, 'madvise'):
+            mapped.madvise(advice)
+
+        return memoryview(mapped)
+
+    def iter_get(self, filename, chunk_size=65536):
+        """Iterate file from the storage
+
+        Read the file in chunks so the whole file never loaded in memory.
+
+        Args:
+            filename (str): the name of the file to get.
+            chunk_size (optional[int]): max size of each chunk in bytes.
+
+        Returns:
+            generator: yields bytes chunks of the file.
+            bool: False if failed to open the file.
+
+        Examples:
+            for chunk in disk.iter_get('filename.txt'):
+                print(chunk)
+        """
+        try:
+            file = open(self.__base(filename), 'rb')
+        except OSError as e:
+            print('Iter Get:', e)
+            record(e)
+            return False
+
+        return _read(file, chunk_size)
+
     def delete(self, filename):
         """Delete file from the storage
 
@@ -102,12 +237,32 @@ class Local:
             return True
         except OSError as e:
             print('Delete:', e)
+            record(e)
             return False
 
+    def delete_many(self, filenames):
+        """Delete many files from the storage
+
+        Delete the files concurrently by ``concurrency`` setting threads.
+
+        Args:
+            filenames (list|generator): the names of the files to delete.
+
+        Returns:
+            dict: filename as key, True if deleted, False otherwise.
+
+        Examples:
+            disk.delete_many(['filename1.txt', 'filename2.txt'])
+        """
+        filenames = list(filenames)
+
+        with ThreadPoolExecutor(self.setting.get('concurrency')) as executor:
+            return dict(zip(filenames, executor.map(self.delete, filenames)))
+
     def copy(self, filename, destination):
         """Copy file from the storage
 
-        Return the content of the file.
+        Copy the file in binary mode inside the kernel, reflink if the filesystem supports it.
 
         Args:
             filename (str): the name of the file to copy.
@@ -120,12 +275,11 @@ class Local:
              ``disk.copy('filename.txt', 'copy_of_filename.txt')``
         """
         try:
-            with open(self.__base(filename)) as f:
-                self.put(destination, f.read())
-                f.close()
-                return True
+            _copy_file(self.__base(filename), self.__base(destination))
+            return True
         except OSError as e:
             print('Copy:', e)
+            record(e)
 
         return False
 
@@ -149,6 +303,7 @@ class Local:
             return True
         except OSError as e:
             print('Move:', e)
+            record(e)
             return False
 
     def exist(self, filename):
@@ -167,6 +322,26 @@ class Local:
         """
         return os.path.exists(self.__base(filename))
 
+    def size(self, filename):
+        """File size
+
+        Args:
+            filename (str): the name of the file.
+
+        Returns:
+            int: size of the file in bytes, False if failed.
+
+        Examples:
+            disk.size('filename.txt')
+        """
+        try:
+            return os.path.getsize(self.__base(filename))
+        except OSError as e:
+            print('Size:', e)
+            record(e)
+
+        return False
+
     def permissions(self, filename, chmod=None):
         """File Permissions
 
@@ -197,10 +372,11 @@ class Local:
                 return True
         except OSError as e:
             print('Permissions:', e)
+            record(e)
 
         return False
 
-    def files(self, directory=None, prefix=None, suffix=None):
+    def files(self, directory=None, prefix=None, suffix=None, recursive=False):
         """Files List
 
         Get all files inside the selected folder
@@ -209,9 +385,12 @@ class Local:
             directory (optional[str]): the folder to look in it.
             prefix (optional[str]): a str files names start with.
             suffix (optional[str]): a str files names ends with.
+            recursive (optional[boolean]): walk sub folders too.
 
         Returns:
             list: a list of folder's files.
+            generator: if recursive, yields Entry(name, size, mtime) with the path relative to the folder,
+                raises OSError if a folder can't be listed, so an incomplete listing never looks complete.
 
         Examples:
             # Root folder
@@ -222,26 +401,29 @@ class Local:
 
             # Filters
             disk.files('sub_folder', prefix='log', suffix='.txt')
+
+            # Recursive
+            for entry in disk.files('sub_folder', recursive=True):
+                print(entry.name, entry.size, entry.mtime)
         """
         directory = '.' if directory is None else directory
         directory = self.__base(directory)
 
+        if recursive:
+            return self.__walk(directory, prefix, suffix)
+
         files = []
 
         try:
-            files = [f for f in os.listdir(directory) if os.path.isfile(directory + '/' + f)]
-
-            if prefix is not None:
-                files = [f for f in files if f.startswith(prefix)]
-
-            if suffix is not None:
-                files = [f for f in files if f.endswith(suffix)]
+            with os.scandir(directory) as entries:
+                files = [e.name for e in entries if e.is_file() and self.__match(e.name, prefix, suffix)]
         except OSError as e:
             print('Files:', e)
+            record(e)
 
         return files
 
-    def dirs(self, directory=None, prefix=None, suffix=None):
+    def dirs(self, directory=None, prefix=None, suffix=None, recursive=False):
         """Directories List
 
         Get all Directories inside the selected folder
@@ -250,9 +432,12 @@ class Local:
             directory (optional[str]): the folder to look in it.
             prefix (optional[str]): a str directories names start with.
             suffix (optional[str]): a str directories names ends with.
+            recursive (optional[boolean]): walk sub folders too.
 
         Returns:
             list: a list of folder's directories.
+            generator: if recursive, yields directories paths relative to the folder, raises OSError if a folder
+                can't be listed.
 
         Examples:
             # Root folder
@@ -263,22 +448,24 @@ class Local:
 
             # Filters
             disk.dirs('sub_folder', prefix='imgs', suffix='text')
+
+            # Recursive
+            disk.dirs('sub_folder', recursive=True)
         """
         directory = '.' if directory is None else directory
         directory = self.__base(directory)
 
+        if recursive:
+            return self.__walk(directory, prefix, suffix, dirs=True)
+
         dirs = []
 
         try:
-            dirs = [d for d in os.listdir(directory) if os.path.isdir(directory + '/' + d)]
-
-            if prefix is not None:
-                dirs = [d for d in dirs if d.startswith(prefix)]
-
-            if suffix is not None:
-                dirs = [d for d in dirs if d.endswith(suffix)]
+            with os.scandir(directory) as entries:
+                dirs = [e.name for e in entries if e.is_dir() and self.__match(e.name, prefix, suffix)]
         except OSError as e:
             print('Dirs:', e)
+            record(e)
 
         return dirs
 
@@ -303,6 +490,7 @@ class Local:
             return True
         except OSError as e:
             print('Create Directory:', e)
+            record(e)
 
         return False
 
@@ -335,8 +523,46 @@ class Local:
             return True
         except OSError as e:
             print('Delete Directory:', e)
+            record(e)
             return False
 
+    def __walk(self, directory, prefix, suffix, dirs=False):
+        """Walk Directory
+
+        Walk the folder tree with scandir, file type and stat come from the same DirEntry.
+
+        Args:
+            directory (str): full path of the folder to walk.
+            prefix (str): a str names start with.
+            suffix (str): a str names ends with.
+            dirs (optional[boolean]): yield directories instead of files.
+
+        Returns:
+            generator: yields Entry for files, or relative paths for directories.
+        """
+        stack = [(directory, '')]
+
+        while stack:
+            path, relative = stack.pop()
+
+            with os.scandir(path) as entries:
+                for e in entries:
+                    name = relative + e.name
+
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append((e.path, name + '/'))
+
+                        if dirs and self.__match(e.name, prefix, suffix):
+                            yield name
+
+                    elif not dirs and e.is_file() and self.__match(e.name, prefix, suffix):
+                        stat = e.stat()
+                        yield Entry(name, stat.st_size, stat.st_mtime)
+
+    @staticmethod
+    def __match(name, prefix, suffix):
+        return (prefix is None or name.startswith(prefix)) and (suffix is None or name.endswith(suffix))
+
     def __base(self, filename):
         """Set Full Path
 
@@ -355,3 +581,66 @@ class Local:
 
         if isinstance(base, str):
             return base + '/' + filename
+
+
+def _copy_file(source, destination):
+    """Copy File
+
+    Copy file without reading it in user space. Try reflink, then copy_file_range, then sendfile,
+    and fall back to shutil for the rest.
+
+    Args:
+        source (str): path of the file to copy.
+        destination (str): path of the new file.
+
+    Raises:
+        OSError: if the copy failed, shutil.SameFileError if both paths are the same file.
+    """
+    # Opening the destination truncates it, which would empty the source too
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        raise shutil.SameFileError('{!r} and {!r} are the same file'.format(source, destination))
+
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        size = os.fstat(src.fileno()).st_size
+        offset = 0
+
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                pass
+
+        try:
+            while offset < size:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), size - offset, offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+            return
+        except (AttributeError, OSError):
+            pass
+
+        try:
+            # sendfile writes at the destination position
+            os.lseek(dst.fileno(), offset, os.SEEK_SET)
+
+            while offset < size:
+                sent = os.sendfile(dst.fileno(), src.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            return
+        except (AttributeError, OSError):
+            pass
+
+        src.seek(offset)
+        dst.seek(offset)
+        shutil.copyfileobj(src, dst)
+
+
+def _read(file, chunk_size):
+    """Read opened file in chunks and close it"""
+    with file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            yield chunk
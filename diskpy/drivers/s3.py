@@ -1,5 +1,20 @@
-from boto3 import client
-from botocore.exceptions import ClientError
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
+
+from .utils import parts, is_large, batches, byte_range, Entry, Recorder
+
+# boto3 is imported when the first S3 driver is built, importing it costs more than the rest of diskpy
+boto3 = None
+ClientError = None
+
+
+def _import():
+    global boto3, ClientError
+
+    import boto3
+    from botocore.exceptions import ClientError
 
 # ACL='private'|'public-read'|'public-read-write'|'authenticated-read'|'aws-exec-read'
 
@@ -13,7 +28,10 @@ class S3:
         'bucket': 'bucket_name',
         'region': 'region_name',
         'access_key': 'your_access_key',
-        'secret_key': 'your_secret_key'
+        'secret_key': 'your_secret_key',
+        'part_size': 8 * 1024 * 1024,
+        'concurrency': 4,
+        'multipart_threshold': 64 * 1024 * 1024
     }
 
     def __init__(self, setting, bucket=None):
@@ -28,25 +46,42 @@ class S3:
         Returns:
             S3 class object
         """
-        self.setting.update(setting)
-        self.client = client(
-            's3',
-            region_name=self.setting.get('region'),
-            aws_access_key_id=self.setting.get('access_key'),
-            aws_secret_access_key=self.setting.get('secret_key'),
-        )
+        _import()
 
+        self.setting = dict(self.setting, **setting)
         self.bucket_name = self.setting.get('bucket') if bucket is None else bucket
-
-    def put(self, filename, content=None, acl='private', **kwargs):
+        self.__client = None
+        self.__lock = Lock()
+
+    @property
+    def client(self):
+        """boto3 S3 client, created on first use"""
+        if self.__client is None:
+            with self.__lock:
+                if self.__client is None:
+                    self.__client = Recorder(boto3.client(
+                        's3',
+                        region_name=self.setting.get('region'),
+                        aws_access_key_id=self.setting.get('access_key'),
+                        aws_secret_access_key=self.setting.get('secret_key'),
+                        endpoint_url=self.setting.get('endpoint'),
+                    ))
+
+        return self.__client
+
+    def put(self, filename, content=None, acl='private', multipart=None, **kwargs):
         """Put file to the storage
 
-        Create file in the storage and put the content on it, Content can be text, file handler or empty.
+        Create file in the storage and put the content on it, Content can be text, file handler, generator or empty.
+
+        Generators and files larger than the ``multipart_threshold`` setting are uploaded with multipart upload,
+        ``part_size`` and ``concurrency`` settings control the size of each part and how many are sent at once.
 
         Args:
             filename (str): the name of the file to create.
-            content (optional[str|file]): the content to put in file.
+            content (optional[str|file|generator]): the content to put in file.
             acl (optional[str]): can be private, public-read, public-read-write, authenticated-read, aws-exec-read
+            multipart (optional[boolean]): force or disable multipart upload, if is none will decide by content size.
             **kwargs
 
         Returns:
@@ -57,8 +92,16 @@ class S3:
             disk.put('filename.txt', 'some text')
             disk.put('filename.txt', open('file.txt'))
             disk.put('filename.txt', open('img.png'), acl='public-read')
+            disk.put('video.mp4', open('video.mp4', 'rb'), multipart=True)
         """
         content = '' if content is None else content
+
+        if multipart is None:
+            multipart = is_large(content, self.setting.get('multipart_threshold'))
+
+        if multipart:
+            return self.__put_multipart(filename, content, acl, **kwargs)
+
         content = content.read() if hasattr(content, 'read') else content
 
         try:
@@ -67,8 +110,95 @@ class S3:
         except ClientError:
             return False
 
-    def get(self, filename, save_to=None, **kwargs):
+    def __put_multipart(self, filename, content, acl, **kwargs):
+        part_size = self.setting.get('part_size')
+        concurrency = self.setting.get('concurrency')
+
+        try:
+            upload_id = self.client.create_multipart_upload(Bucket=self.bucket_name, Key=filename, ACL=acl,
+                                                            **kwargs)['UploadId']
+        except ClientError:
+            return False
+
+        def upload(number, body):
+            request = self.client.upload_part(Bucket=self.bucket_name, Key=filename, UploadId=upload_id,
+                                              PartNumber=number, Body=body)
+            return {'PartNumber': number, 'ETag': request['ETag']}
+
+        uploaded = []
+        completed = False
+
         try:
+            with ThreadPoolExecutor(concurrency) as executor:
+                pending = set()
+
+                # Keep at most `concurrency` parts in memory, read the next one only when a slot is free
+                for number, body in enumerate(parts(content, part_size), 1):
+                    if len(pending) >= concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        uploaded.extend(f.result() for f in done)
+
+                    pending.add(executor.submit(upload, number, body))
+
+                uploaded.extend(f.result() for f in pending)
+
+            uploaded.sort(key=lambda part: part['PartNumber'])
+            self.client.complete_multipart_upload(Bucket=self.bucket_name, Key=filename, UploadId=upload_id,
+                                                  MultipartUpload={'Parts': uploaded})
+            completed = True
+            return True
+        except ClientError:
+            return False
+        finally:
+            if not completed:
+                self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=filename, UploadId=upload_id)
+
+    def get(self, filename, save_to=None, parallel=False, offset=None, length=None, **kwargs):
+        """Get file from the storage
+
+        Return the content of the file.
+
+        In parallel mode the object size is read with head_object, then ranges of ``part_size`` setting
+        are downloaded by ``concurrency`` threads and written at their offsets in ``save_to``.
+        With offset or length only the byte range is downloaded with the Range header.
+
+        Args:
+            filename (str): the name of the file to get.
+            save_to (optional[str]): file path to save copy of the file there.
+            parallel (optional[boolean]): download byte ranges concurrently.
+            offset (optional[int]): first byte to download, negative counts from the end of the object.
+            length (optional[int]): max number of bytes to download.
+            **kwargs
+
+        Returns:
+            bytes: the content of the file, True if saved in parallel mode, False otherwise.
+
+        Examples:
+            disk.get('filename.txt')
+            disk.get('filename.txt', save_to='path/to/file.txt')
+            disk.get('video.mp4', save_to='path/to/video.mp4', parallel=True)
+
+            # Header and footer
+            disk.get('data.parquet', offset=0, length=4)
+            disk.get('data.parquet', offset=-65536)
+        """
+        try:
+            if offset is not None or length is not None:
+                file = self.__get_range(filename, offset, length, **kwargs)
+
+                if save_to is not None:
+                    with open(save_to, 'wb') as f:
+                        f.write(file)
+
+                return file
+
+            if parallel:
+                if save_to is not None:
+                    return self.__get_parallel(filename, save_to, **kwargs)
+
+                size = self.client.head_object(Bucket=self.bucket_name, Key=filename, **kwargs)['ContentLength']
+                return b''.join(self.__iter_ranges(filename, size, **kwargs))
+
             file = self.client.get_object(Bucket=self.bucket_name, Key=filename, **kwargs)['Body'].read()
 
             if save_to is not None:
@@ -80,6 +210,124 @@ class S3:
         except ClientError:
             return False
 
+    def __get_range(self, filename, offset, length, **kwargs):
+        header = byte_range(offset, length)
+
+        if header is None:
+            return b''
+
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=filename, Range=header, **kwargs)
+        except ClientError as e:
+            # Range starts after the end of the object
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                return b''
+            raise
+
+        # Suffix range of the tail is cut to length here
+        file = response['Body'].read()
+        return file if length is None else file[:length]
+
+    def iter_get(self, filename, chunk_size=65536, parallel=False, **kwargs):
+        """Iterate file from the storage
+
+        Stream the object body in chunks so the whole object never loaded in memory.
+        In parallel mode ranges are downloaded concurrently and yielded in order.
+
+        Args:
+            filename (str): the name of the file to get.
+            chunk_size (optional[int]): max size of each chunk in bytes.
+            parallel (optional[boolean]): download byte ranges concurrently.
+            **kwargs
+
+        Returns:
+            generator: yields bytes chunks of the file.
+            bool: False if failed to get the file.
+
+        Examples:
+            for chunk in disk.iter_get('filename.txt'):
+                print(chunk)
+        """
+        try:
+            if parallel:
+                size = self.client.head_object(Bucket=self.bucket_name, Key=filename, **kwargs)['ContentLength']
+                return _split(self.__iter_ranges(filename, size, **kwargs), chunk_size)
+
+            body = self.client.get_object(Bucket=self.bucket_name, Key=filename, **kwargs)['Body']
+        except ClientError:
+            return False
+
+        return _chunks(body, chunk_size)
+
+    def get_if_changed(self, filename, revision=None, chunk_size=65536, **kwargs):
+        """Get file from the storage if changed
+
+        Send the known ETag as IfNoneMatch, S3 answers 304 Not Modified without body if it is the same.
+
+        Args:
+            filename (str): the name of the file to get.
+            revision (optional[str]): ETag of the copy the caller has.
+            chunk_size (optional[int]): max size of each chunk in bytes.
+            **kwargs
+
+        Returns:
+            tuple: (ETag, generator of bytes chunks), generator is None if not changed.
+            bool: False if failed.
+
+        Examples:
+            etag, chunks = disk.get_if_changed('filename.txt', revision=etag)
+        """
+        if revision is not None:
+            kwargs['IfNoneMatch'] = revision
+
+        try:
+            request = self.client.get_object(Bucket=self.bucket_name, Key=filename, **kwargs)
+        except ClientError as e:
+            if e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304:
+                return revision, None
+
+            return False
+
+        return request['ETag'], _chunks(request['Body'], chunk_size)
+
+    def __get_parallel(self, filename, save_to, **kwargs):
+        size = self.client.head_object(Bucket=self.bucket_name, Key=filename, **kwargs)['ContentLength']
+        fd = os.open(save_to, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+        def download(start, end):
+            os.pwrite(fd, self.__get_part(filename, start, end, **kwargs), start)
+
+        try:
+            os.ftruncate(fd, size)
+
+            with ThreadPoolExecutor(self.setting.get('concurrency')) as executor:
+                list(executor.map(lambda r: download(*r), _ranges(size, self.setting.get('part_size'))))
+        finally:
+            os.close(fd)
+
+        return True
+
+    def __iter_ranges(self, filename, size, **kwargs):
+        concurrency = self.setting.get('concurrency')
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            pending = deque()
+
+            # Download ahead at most `concurrency` ranges and hand them back in order
+            for start, end in _ranges(size, self.setting.get('part_size')):
+                pending.append(executor.submit(self.__get_part, filename, start, end, **kwargs))
+
+                if len(pending) >= concurrency:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def __get_part(self, filename, start, end, **kwargs):
+        request = self.client.get_object(Bucket=self.bucket_name, Key=filename,
+                                         Range='bytes=%d-%d' % (start, end), **kwargs)
+        return request['Body'].read()
+
     def delete(self, filename, **kwargs):
         try:
             self.client.delete_object(Bucket=self.bucket_name, Key=filename, **kwargs)
@@ -87,14 +335,107 @@ class S3:
         except ClientError:
             return False
 
-    def copy(self, filename, destination, acl='private', **kwargs):
+    def delete_many(self, filenames, **kwargs):
+        """Delete many files from the storage
+
+        Send the keys in batches of 1000 per delete_objects request.
+
+        Args:
+            filenames (list|generator): the names of the files to delete.
+            **kwargs
+
+        Returns:
+            dict: filename as key, True if deleted, False otherwise.
+
+        Examples:
+            disk.delete_many(['filename1.txt', 'filename2.txt'])
+            disk.delete_many(disk.files('logs'))
+        """
+        results = {}
+
+        for batch in batches(filenames, 1000):
+            try:
+                request = self.client.delete_objects(Bucket=self.bucket_name, Delete={
+                    'Objects': [{'Key': key} for key in batch],
+                    'Quiet': True
+                }, **kwargs)
+
+                results.update((key, True) for key in batch)
+                results.update((e.get('Key'), False) for e in request.get('Errors', []))
+            except ClientError:
+                results.update((key, False) for key in batch)
+
+        return results
+
+    def copy(self, filename, destination, acl='private', multipart=None, **kwargs):
+        """Copy file from the storage
+
+        Copy the object inside the bucket on the server side. Objects larger than the ``multipart_threshold``
+        setting are copied as ``part_size`` ranges by ``concurrency`` parallel upload_part_copy requests.
+
+        Args:
+            filename (str): the name of the file to copy.
+            destination (str): the name of the new file.
+            acl (optional[str]): can be private, public-read, public-read-write, authenticated-read, aws-exec-read
+            multipart (optional[boolean]): force or disable multipart copy, if is none will decide by object size.
+            **kwargs
+
+        Returns:
+            bool: True if successful, False otherwise.
+
+        Examples:
+            disk.copy('filename.txt', 'copy_of_filename.txt')
+            disk.copy('video.mp4', 'copy_of_video.mp4', multipart=True)
+        """
         try:
+            if multipart is not False:
+                head = self.client.head_object(Bucket=self.bucket_name, Key=filename)
+                size = head['ContentLength']
+
+                if size > 0 and (multipart or size >= self.setting.get('multipart_threshold')):
+                    return self.__copy_multipart(filename, destination, head, acl, **kwargs)
+
             self.client.copy_object(Bucket=self.bucket_name, Key=destination, ACL=acl,
                                     CopySource={'Bucket': self.bucket_name, 'Key': filename}, **kwargs)
             return True
         except ClientError:
             return False
 
+    def __copy_multipart(self, filename, destination, head, acl, **kwargs):
+        size = head['ContentLength']
+        # S3 allows at most 10000 parts
+        part_size = max(self.setting.get('part_size'), -(-size // 10000))
+        source = {'Bucket': self.bucket_name, 'Key': filename}
+
+        # Multipart copy does not carry the source metadata over
+        options = {'Metadata': head.get('Metadata', {})}
+        if 'ContentType' in head:
+            options['ContentType'] = head['ContentType']
+        options.update(kwargs)
+
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket_name, Key=destination, ACL=acl,
+                                                        **options)['UploadId']
+
+        def copy(number, byte_range):
+            request = self.client.upload_part_copy(Bucket=self.bucket_name, Key=destination, UploadId=upload_id,
+                                                   PartNumber=number, CopySource=source,
+                                                   CopySourceRange='bytes=%d-%d' % byte_range)
+            return {'PartNumber': number, 'ETag': request['CopyPartResult']['ETag']}
+
+        completed = False
+
+        try:
+            with ThreadPoolExecutor(self.setting.get('concurrency')) as executor:
+                uploaded = list(executor.map(lambda part: copy(*part), enumerate(_ranges(size, part_size), 1)))
+
+            self.client.complete_multipart_upload(Bucket=self.bucket_name, Key=destination, UploadId=upload_id,
+                                                  MultipartUpload={'Parts': uploaded})
+            completed = True
+            return True
+        finally:
+            if not completed:
+                self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=destination, UploadId=upload_id)
+
     def move(self, filename, destination, acl='private'):
         try:
             if self.copy(filename, destination, acl=acl):
@@ -112,6 +453,12 @@ class S3:
         except ClientError:
             return False
 
+    def size(self, filename, **kwargs):
+        try:
+            return self.client.head_object(Bucket=self.bucket_name, Key=filename, **kwargs)['ContentLength']
+        except ClientError:
+            return False
+
     def permissions(self, filename, acl=None, **kwargs):
         try:
             if acl is None:
@@ -124,45 +471,108 @@ class S3:
         except ClientError:
             return False
 
-    def files(self, directory=None, prefix=None, suffix=None, **kwargs):
+    def files(self, directory=None, prefix=None, suffix=None, recursive=False, **kwargs):
+        """Files List
+
+        Lazily list all files under the selected prefix, following the listing continuation tokens.
+
+        Args:
+            directory (optional[str]): the folder to look in it.
+            prefix (optional[str]): a str files names start with.
+            suffix (optional[str]): a str files names ends with.
+            recursive (optional[boolean]): yield Entry(name, size, mtime, etag) of all keys under the folder.
+            **kwargs
+
+        Returns:
+            generator: yields keys of folder's files as each page arrives, if recursive raises ClientError
+                if a page fails, so an incomplete listing never looks complete.
+
+        Examples:
+            for key in disk.files('sub_folder', prefix='log', suffix='.txt'):
+                print(key)
+
+            for entry in disk.files('sub_folder', recursive=True):
+                print(entry.name, entry.size, entry.mtime, entry.etag)
+        """
         directory = '' if directory is None else directory
+        folder = directory + '/' if directory else ''
         prefix = directory if prefix is None else directory + '/' + prefix
 
-        files = []
+        if recursive:
+            prefix = folder if prefix == directory else prefix
 
-        try:
-            request = self.client.list_objects(Bucket=self.bucket_name, Prefix=prefix, **kwargs)
+        for page in self.__list(recursive, Prefix=prefix, **kwargs):
+            for f in page.get('Contents', []):
+                key = f.get('Key')
 
-            if 'Contents' in request:
-                for f in request['Contents']:
-                    key = f.get('Key')
+                if key.endswith('/') or (suffix is not None and not key.endswith(suffix)):
+                    continue
 
-                    if not key.endswith('/') and (suffix is None or key.endswith(suffix)):
-                        files.append(key)
-        except ClientError:
-            pass
+                if recursive:
+                    yield Entry(key[len(folder):], f.get('Size'), f.get('LastModified').timestamp(), f.get('ETag'))
+                else:
+                    yield key
+
+    def dirs(self, directory=None, prefix=None, suffix=None, **kwargs):
+        """Directories List
+
+        Lazily list all directories under the selected prefix, following the listing continuation tokens.
 
-        return files
+        Args:
+            directory (optional[str]): the folder to look in it.
+            prefix (optional[str]): a str directories names start with.
+            suffix (optional[str]): a str directories names ends with.
+            **kwargs
 
-    def dirs(self, directory, prefix=None, suffix=None, **kwargs):
+        Returns:
+            generator: yields prefixes of folder's directories as each page arrives.
+
+        Examples:
+            for prefix in disk.dirs('sub_folder'):
+                print(prefix)
+        """
         directory = '' if directory is None else directory + '/'
         prefix = directory if prefix is None else directory + prefix
 
-        dirs = []
+        for page in self.__list(False, Prefix=prefix, Delimiter='/', **kwargs):
+            for d in page.get('CommonPrefixes', []):
+                key = d.get('Prefix')
+
+                if suffix is None or key.endswith(suffix):
+                    yield key
 
+    def __list(self, strict, **kwargs):
         try:
-            request = self.client.list_objects(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/', **kwargs)
+            while True:
+                request = self.client.list_objects_v2(Bucket=self.bucket_name, **kwargs)
+                yield request
 
-            if 'CommonPrefixes' in request:
-                request = request['CommonPrefixes']
-                for d in request:
-                    key = d.get('Prefix')
+                if not request.get('IsTruncated'):
+                    break
 
-                    if suffix is None or key.endswith(suffix):
-                        dirs.append(key)
+                kwargs['ContinuationToken'] = request['NextContinuationToken']
         except ClientError:
-            pass
+            if strict:
+                raise
+
+
+def _chunks(body, chunk_size):
+    """Read streaming body in chunks and close it"""
+    try:
+        for chunk in iter(lambda: body.read(chunk_size), b''):
+            yield chunk
+    finally:
+        body.close()
+
 
-        return dirs
+def _split(parts, chunk_size):
+    """Split bytes parts to chunks of chunk_size"""
+    for part in parts:
+        for i in range(0, len(part), chunk_size):
+            yield part[i:i + chunk_size]
 
 
+def _ranges(size, part_size):
+    """Split size to inclusive (start, end) byte ranges of part_size"""
+    for start in range(0, size, part_size):
+        yield start, min(start + part_size, size) - 1
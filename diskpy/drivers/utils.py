@@ -0,0 +1,261 @@
+import io
+import os
+from collections import namedtuple
+from itertools import islice
+from queue import Queue, Full
+from threading import Thread, Event, local
+
+# File of recursive listings, name is relative to the listed folder and etag is the storage content tag if any
+Entry = namedtuple('Entry', ['name', 'size', 'mtime', 'etag'], defaults=[None])
+
+# Drivers return False on errors, the last error of each thread is kept for the retry layer
+_errors = local()
+
+
+def record(error):
+    _errors.last = error
+
+
+def last_error(clear=False):
+    """Last error of the storage in this thread
+
+    Args:
+        clear (optional[boolean]): forget it after returning it.
+
+    Returns:
+        Exception: the last error raised by the SDK or connection, None if no error.
+    """
+    error = getattr(_errors, 'last', None)
+
+    if clear:
+        _errors.last = None
+
+    return error
+
+
+class Recorder:
+    """Proxy of SDK client, records errors of its calls before the driver handles them"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            try:
+                return attr(*args, **kwargs)
+            except Exception as e:
+                record(e)
+                raise
+
+        return call
+
+
+def chunks(content, chunk_size=65536):
+    """Iterate content as bytes chunks
+
+    Args:
+        content (str|bytes|file|generator): the content to iterate, str is encoded as utf-8.
+        chunk_size (optional[int]): size of each read from file content.
+
+    Returns:
+        generator: yields bytes chunks.
+    """
+    if content is None:
+        items = []
+    elif isinstance(content, (str, bytes)):
+        items = [content]
+    elif hasattr(content, 'read'):
+        items = iter(lambda: content.read(chunk_size), content.read(0))
+    else:
+        items = content
+
+    for item in items:
+        yield item.encode() if isinstance(item, str) else item
+
+
+def parts(content, part_size):
+    """Split content to bytes parts of part_size, the last part may be smaller
+
+    Args:
+        content (str|bytes|file|generator): the content to split.
+        part_size (int): size of each part in bytes.
+
+    Returns:
+        generator: yields bytes parts, at least one even if the content is empty.
+    """
+    buffer = bytearray()
+    sent = False
+
+    for chunk in chunks(content, part_size):
+        buffer += chunk
+
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+            sent = True
+
+    if buffer or not sent:
+        yield bytes(buffer)
+
+
+def is_large(content, threshold):
+    """Check if content should be sent in parts
+
+    Args:
+        content (str|bytes|file|generator): the content to check.
+        threshold (int): size in bytes to consider content large.
+
+    Returns:
+        bool: True if content size reach threshold or is unknown generator, False otherwise.
+    """
+    if isinstance(content, (str, bytes)):
+        return len(content) >= threshold
+
+    if not hasattr(content, 'read'):
+        # Generators have unknown size
+        return True
+
+    try:
+        return os.fstat(content.fileno()).st_size - content.tell() >= threshold
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def span(size, offset=None, length=None):
+    """Bounds of byte range
+
+    Args:
+        size (int): the size of the file.
+        offset (optional[int]): first byte, negative counts from the end of the file.
+        length (optional[int]): max number of bytes, if is none will read to the end.
+
+    Returns:
+        tuple: (start, end) inside the file, end is exclusive.
+    """
+    offset = 0 if offset is None else offset
+    start = max(0, size + offset) if offset < 0 else min(offset, size)
+    end = size if length is None else min(size, start + length)
+    return start, end
+
+
+def byte_range(offset=None, length=None):
+    """HTTP Range header of byte range
+
+    Negative offset is sent as suffix range, the tail is read without knowing the size.
+
+    Returns:
+        str: Range header value, None if the range is empty.
+    """
+    offset = 0 if offset is None else offset
+
+    if length == 0:
+        return None
+
+    if offset < 0:
+        return 'bytes=%d' % offset
+
+    return 'bytes=%d-%s' % (offset, '' if length is None else offset + length - 1)
+
+
+def batches(items, size):
+    """Split items to lists of size, the last list may be smaller
+
+    Args:
+        items (iterable): the items to split, can be a generator.
+        size (int): max length of each list.
+
+    Returns:
+        generator: yields lists of items.
+    """
+    items = iter(items)
+    batch = list(islice(items, size))
+
+    while batch:
+        yield batch
+        batch = list(islice(items, size))
+
+
+class ChunkReader(io.RawIOBase):
+    """ ChunkReader class read bytes chunks as file
+
+    File like object over an iterator of bytes chunks, for clients which read from files only.
+    """
+
+    def __init__(self, items):
+        self.items = iter(items)
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.buffer:
+            try:
+                self.buffer = next(self.items)
+            except StopIteration:
+                return 0
+
+        size = min(len(b), len(self.buffer))
+        b[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+def prefetch(items, size=8):
+    """Read ahead items in background thread
+
+    At most ``size`` items wait in memory, so the producer and the consumer overlap with bounded buffer.
+    Exceptions of the producer are raised to the consumer.
+
+    Args:
+        items (iterable): the items to read, like bytes chunks of a download.
+        size (optional[int]): max number of items read ahead.
+
+    Returns:
+        generator: yields the same items.
+    """
+    queue = Queue(size)
+    stop = Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=1)
+                return
+            except Full:
+                pass
+
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                put((item, None))
+        except BaseException as e:
+            put((done, e))
+        else:
+            put((done, None))
+
+    thread = Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, error = queue.get()
+
+            if error is not None:
+                raise error
+
+            if item is done:
+                break
+
+            yield item
+    finally:
+        stop.set()
+        thread.join()
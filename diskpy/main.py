@@ -1,5 +1,11 @@
 import os
 from importlib import import_module
+from threading import Lock
+from types import GeneratorType
+
+# Disk methods which results can be cached, and which change the storage
+READS = ('exist', 'size', 'permissions', 'files', 'dirs')
+WRITES = ('put', 'delete', 'delete_many', 'copy', 'move', 'permissions', 'make_dir', 'delete_dir')
 
 
 class SettingException(Exception):
@@ -13,11 +19,25 @@ class Disk:
     Passing data to driver and return respond"""
     setting = {}
     driver = None
+    cache = None
+
+    # Drivers are built once per disk and shared by all Disk objects
+    registry = {}
+    lock = Lock()
+
+    # Callables receiving metrics.Call of every driver call, and metrics.SlowProfiler
+    subscribers = ()
+    profiler = None
 
     def __init__(self, disk=None, **kwargs):
         """Init disk object
 
-        Load setting module, call driver module and pass setting.
+        Load setting module once, call driver module and pass setting.
+        The driver of each disk is built on first use and shared, ``Disk.reset()`` closes them.
+        If the disk setting has ``metadata_cache`` dict, exist, permissions and listings results are cached.
+        If the disk setting has ``content_cache`` dict, files are read through a local copy.
+        If the disk setting has ``compression`` dict, files are compressed on put and decompressed on get.
+        If the disk setting has ``retry`` dict, calls failed with transient errors are retried.
 
         Args:
             disk (str): Name of disk in setting module, if is none will use default disk.
@@ -30,22 +50,115 @@ class Disk:
             SettingException: Setting module not found or Driver not found.
         """
         setting_module = os.environ.get('DISKPY_SETTING')
-        if setting_module is not None:
-            self.setting = import_module(setting_module + '').STORAGE
-            disk = self.setting.get('default') if disk is None else disk
-            setting = self.setting.get(disk)
+        if setting_module is None:
+            raise SettingException('Setting module not found.')
 
-            if setting is not None:
-                driver = setting.get('driver')
+        with Disk.lock:
+            if not Disk.setting:
+                Disk.setting = import_module(setting_module + '').STORAGE
 
-                if callable(driver):
-                    self.driver = driver(setting, **kwargs)
+            disk = Disk.setting.get('default') if disk is None else disk
+            # Driver args can be lists or dicts, which are not hashable
+            key = (disk, repr(sorted(kwargs.items())))
 
-            if self.driver is None:
-                raise SettingException('Driver not found.')
+            if key not in Disk.registry:
+                Disk.registry[key] = self.__load(disk, Disk.setting.get(disk), **kwargs)
 
-        else:
-            raise SettingException('Setting module not found.')
+            self.driver, self.cache = Disk.registry[key]
+            self.name = disk
+
+    @staticmethod
+    def __load(disk, setting, **kwargs):
+        from .cache import MetadataCache, ContentCache
+        from .compress import Compression
+        from .retry import Retry
+
+        driver = None
+        cache = None
+
+        if setting is not None:
+            driver = setting.get('driver')
+
+            if callable(driver):
+                driver = driver(setting, **kwargs)
+
+                if setting.get('retry') is not None:
+                    driver = Retry(driver, **setting.get('retry'))
+
+                # Each disk keeps its cached files in its own subfolder of the cache path
+                if setting.get('content_cache') is not None:
+                    name = '-'.join([str(disk)] + [str(v) for k, v in sorted(kwargs.items())])
+                    driver = ContentCache(driver, **dict({'name': name}, **setting.get('content_cache')))
+
+                # Outside the content cache, cached copies stay compressed
+                if setting.get('compression') is not None:
+                    driver = Compression(driver, **setting.get('compression'))
+            else:
+                driver = None
+
+            if setting.get('metadata_cache') is not None:
+                cache = MetadataCache(**setting.get('metadata_cache'))
+
+        if driver is None:
+            raise SettingException('Driver not found.')
+
+        return driver, cache
+
+    @classmethod
+    def reset(cls):
+        """Reset Disks
+
+        Close all shared drivers, the setting module is loaded again on next use.
+
+        Examples:
+            Disk.reset()
+        """
+        with cls.lock:
+            for driver, cache in cls.registry.values():
+                if hasattr(driver, 'close'):
+                    driver.close()
+
+            cls.registry.clear()
+            cls.setting = {}
+
+    @classmethod
+    def subscribe(cls, subscriber):
+        """Subscribe to driver calls
+
+        The subscriber is called after every driver call of all disks with metrics.Call, which has disk name,
+        driver name, operation, seconds, bytes in, bytes out, ok and error class name if the driver raised.
+        Without subscribers and profiler calls are not measured.
+
+        Args:
+            subscriber (callable): receive metrics.Call, eg. metrics.Histograms or metrics.StatsdSink.
+
+        Examples:
+            from diskpy.metrics import Histograms, SlowProfiler
+
+            histograms = Histograms()
+            Disk.subscribe(histograms)
+            Disk.subscribe(lambda call: call.seconds > 1 and print(call))
+
+            # Keep cProfile stats of sampled calls slower than threshold
+            Disk.profiler = SlowProfiler(threshold=0.5, path='profiles', sample=0.1)
+        """
+        with cls.lock:
+            cls.subscribers = cls.subscribers + (subscriber,)
+
+    @classmethod
+    def unsubscribe(cls, subscriber):
+        with cls.lock:
+            cls.subscribers = tuple(s for s in cls.subscribers if s is not subscriber)
+
+    @property
+    def driver_name(self):
+        driver = self.driver
+
+        # Unwrap content cache and compression
+        while 'driver' in vars(driver):
+            driver = vars(driver)['driver']
+
+        return type(driver).__name__
 
     def put(self, filename, content=None, **kwargs):
         return self.__call('put', filename, content, **kwargs)
@@ -53,9 +166,56 @@ class Disk:
     def get(self, filename, save_to=None, **kwargs):
         return self.__call('get', filename, save_to, **kwargs)
 
+    def iter_get(self, filename, chunk_size=65536, **kwargs):
+        return self.__call('iter_get', filename, chunk_size, **kwargs)
+
+    def open_mapped(self, filename, access='sequential'):
+        return self.__call('open_mapped', filename, access)
+
+    def open(self, filename, mode='rb', **kwargs):
+        """Open file from the storage
+
+        Return read-only seekable file object, it reads blocks of the file with byte-range gets when they are
+        needed and keeps them in an LRU cache, sequential reads fetch the next blocks ahead.
+        Libraries which seek in files, like zipfile, tarfile and pandas, read only the parts they need.
+
+        Args:
+            filename (str): the name of the file to open.
+            mode (optional[str]): only 'rb' is supported.
+            **kwargs: Additional args will pass to RangeReader, block_size, cache_size and max_readahead
+
+        Returns:
+            RangeReader: io.RawIOBase file object, False if the file size is unknown.
+
+        Raises:
+            ValueError: mode is not 'rb'.
+
+        Examples:
+            with disk.open('archive.zip') as f:
+                print(zipfile.ZipFile(f).namelist())
+
+            with disk.open('data.bin', block_size=1024 * 1024, cache_size=32) as f:
+                f.seek(-4, io.SEEK_END)
+                f.read(4)
+        """
+        if mode != 'rb':
+            raise ValueError('Only rb mode is supported')
+
+        from .reader import RangeReader
+
+        size = self.size(filename)
+
+        if size is False:
+            return False
+
+        return RangeReader(self, filename, size, **kwargs)
+
     def delete(self, filename, **kwargs):
         return self.__call('delete', filename, **kwargs)
 
+    def delete_many(self, filenames, **kwargs):
+        return self.__call('delete_many', filenames, **kwargs)
+
     def copy(self, filename, destination, **kwargs):
         return self.__call('copy', filename, destination, **kwargs)
 
@@ -65,6 +225,9 @@ class Disk:
     def exist(self, filename, **kwargs):
         return self.__call('exist', filename, **kwargs)
 
+    def size(self, filename, **kwargs):
+        return self.__call('size', filename, **kwargs)
+
     def permissions(self, filename, **kwargs):
         return self.__call('permissions', filename, **kwargs)
 
@@ -80,9 +243,201 @@ class Disk:
     def delete_dir(self, directory):
         return self.__call('delete_dir', directory)
 
+    def transfer(self, filename, disk, destination=None, chunk_size=65536, buffer_size=8, **kwargs):
+        """Transfer file to another disk
+
+        Stream the file chunks from this disk into put of the other disk, the download runs in background
+        thread ahead of the upload by at most ``buffer_size`` chunks. S3 and Dropbox upload the stream with
+        multipart upload and upload session. Within one driver the file is read to a temporary file first.
+
+        Args:
+            filename (str): the name of the file to transfer.
+            disk (Disk): the destination disk.
+            destination (optional[str]): the name of the new file, if is none will use filename.
+            chunk_size (optional[int]): max size of each chunk in bytes.
+            buffer_size (optional[int]): max number of chunks downloaded ahead.
+            **kwargs: Additional args will pass to put of the destination disk
+
+        Returns:
+            bool: True if successful, False otherwise.
+
+        Examples:
+            Disk('s3').transfer('backup.tar', Disk('local'))
+            Disk('ftp').transfer('log.txt', Disk('s3'), 'logs/log.txt', acl='public-read')
+        """
+        from .drivers.utils import prefetch
+
+        destination = filename if destination is None else destination
+
+        content = self.iter_get(filename, chunk_size)
+
+        if content is False:
+            return False
+
+        # Streaming within one driver holds two of its connections, concurrent transfers would wait for each other.
+        # Disk objects of the same disk share the driver
+        if disk.driver is self.driver:
+            from tempfile import SpooledTemporaryFile
+
+            with SpooledTemporaryFile(chunk_size * buffer_size) as buffer:
+                for chunk in content:
+                    buffer.write(chunk)
+
+                buffer.seek(0)
+                return disk.put(destination, buffer, **kwargs)
+
+        return disk.put(destination, prefetch(content, buffer_size), **kwargs)
+
+    def transfer_many(self, filenames, disk, concurrency=4, **kwargs):
+        """Transfer many files to another disk
+
+        Args:
+            filenames (list|generator): the names of the files, or (filename, destination) pairs.
+            disk (Disk): the destination disk.
+            concurrency (optional[int]): max number of files transferred at once.
+            **kwargs: Additional args will pass to transfer
+
+        Returns:
+            dict: filename as key, True if transferred, False otherwise.
+
+        Examples:
+            Disk('local').transfer_many(['a.txt', 'b.txt'], Disk('s3'), concurrency=8)
+            Disk('local').transfer_many([('a.txt', 'backup/a.txt')], Disk('s3'))
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        pairs = [(f, f) if isinstance(f, str) else tuple(f) for f in filenames]
+
+        def transfer(pair):
+            # A stream which breaks midway fails its own file only
+            try:
+                return self.transfer(pair[0], disk, pair[1], **kwargs)
+            except Exception as e:
+                print('Transfer:', e)
+                return False
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            return dict(zip([f for f, d in pairs], executor.map(transfer, pairs)))
+
+    def sync(self, directory, disk, destination=None, delete=False, manifest=None, concurrency=4, **kwargs):
+        """Sync folder to another disk
+
+        Mirror the folder tree to the other disk, only new and changed files are transferred.
+        Both sides are listed recursively with paginated listings, a file is changed if the size differs or
+        the source is newer. With a manifest the size, modification time and ETag of the last synced files are
+        kept in a local JSON file, unchanged files are then skipped without listing the destination.
+
+        Args:
+            directory (str): the folder to sync, if is none will use the root folder.
+            disk (Disk): the destination disk.
+            destination (optional[str]): the destination folder, if is none will use directory.
+            delete (optional[boolean]): delete destination files which are not in the source.
+            manifest (optional[str]): local path of the manifest file.
+            concurrency (optional[int]): max number of files transferred at once.
+            **kwargs: Additional args will pass to transfer
+
+        Returns:
+            dict: names of 'transferred', 'failed', 'deleted' and 'skipped' files, relative to the folders.
+
+        Raises:
+            OSError, ftplib.Error, ClientError or ApiError: a listing failed, nothing is transferred or deleted.
+
+        Examples:
+            Disk('local').sync('photos', Disk('s3'), 'backup/photos', delete=True)
+            Disk('s3').sync('logs', Disk('local'), manifest='logs.json')
+        """
+        import json
+        import posixpath
+
+        destination = directory if destination is None else destination
+
+        def path(folder, name):
+            return name if not folder else posixpath.join(folder, name)
+
+        source = {e.name: e for e in self.files(directory, recursive=True)}
+        synced = {}
+
+        if manifest is not None and os.path.isfile(manifest):
+            with open(manifest) as f:
+                synced = {name: tuple(entry) for name, entry in json.load(f).items()}
+
+        changed = [name for name, e in source.items() if synced.get(name) != (e.size, e.mtime, e.etag)]
+        extra = []
+
+        if not synced or delete:
+            target = {e.name: e for e in disk.files(destination, recursive=True)}
+
+            if not synced:
+                changed = [name for name in changed if name not in target or target[name].size != source[name].size
+                           or target[name].mtime < source[name].mtime]
+
+            if delete:
+                extra = [name for name in target if name not in source]
+
+        results = self.transfer_many([(path(directory, n), path(destination, n)) for n in changed], disk,
+                                     concurrency, **kwargs)
+        transferred = [n for n in changed if results[path(directory, n)]]
+
+        deleted = []
+
+        if delete and extra:
+            results = disk.delete_many([path(destination, n) for n in extra])
+            deleted = [n for n in extra if results.get(path(destination, n))]
+
+        if manifest is not None:
+            failed = set(changed) - set(transferred)
+
+            with open(manifest, 'w') as f:
+                json.dump({n: list(e[1:]) for n, e in source.items() if n not in failed}, f)
+
+        return {
+            'transferred': transferred,
+            'failed': [n for n in changed if n not in transferred],
+            'deleted': deleted,
+            'skipped': [n for n in source if n not in changed]
+        }
+
     def __call(self, method, *args, **kwargs):
-        if hasattr(self.driver, method):
-            return getattr(self.driver, method)(*args, **kwargs)
-        else:
+        if not hasattr(self.driver, method):
             return False
 
+        if Disk.subscribers or Disk.profiler is not None:
+            from .metrics import instrument
+            return instrument(self, method, self.__run, args, kwargs, Disk.subscribers, Disk.profiler)
+
+        return self.__run(method, *args, **kwargs)
+
+    def __run(self, method, *args, **kwargs):
+        call = getattr(self.driver, method)
+
+        if self.cache is None:
+            return call(*args, **kwargs)
+
+        # permissions only changes the file when new permissions are passed
+        if method in WRITES and (method != 'permissions' or any(v is not None for v in kwargs.values())):
+            result = call(*args, **kwargs)
+
+            if method == 'delete_many':
+                filenames = list(result)
+            else:
+                filenames = args[:2] if method in ('copy', 'move') else args[:1]
+
+            self.cache.invalidate(filenames)
+            return result
+
+        if method in READS:
+            key = (method, args, tuple(sorted(kwargs.items())))
+            hit, result = self.cache.get(key)
+
+            if not hit:
+                result = call(*args, **kwargs)
+
+                # Lazy listings can be consumed only once, keep them as list
+                if isinstance(result, GeneratorType):
+                    result = list(result)
+
+                self.cache.set(key, result)
+
+            return result
+
+        return call(*args, **kwargs)
@@ -0,0 +1,359 @@
+import cProfile
+import os
+import random
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from threading import Lock
+from types import GeneratorType
+
+from .drivers.utils import last_error
+
+# Every driver call is published to the subscribers as Call, error is the exception class name if it raised
+# or the class of the error the driver recorded if it returned False
+Call = namedtuple('Call', ['disk', 'driver', 'operation', 'seconds', 'bytes_in', 'bytes_out', 'ok', 'error'])
+
+# Seconds, same as Prometheus default buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+
+def instrument(disk, operation, call, args, kwargs, subscribers, profiler=None):
+    """Run driver call and publish it
+
+    Bytes out are counted from put content, generators are counted while the driver reads them.
+    Bytes in are counted from get result, iter_get chunks are counted while they are read
+    and its Call is published when the iteration ends.
+
+    Args:
+        disk (Disk): the disk of the call.
+        operation (str): the Disk method.
+        call (callable): runs the operation.
+        args (tuple): args of the operation.
+        kwargs (dict): kwargs of the operation.
+        subscribers (tuple): callables receiving Call.
+        profiler (optional[SlowProfiler]): profile sampled calls.
+
+    Returns:
+        the result of the call.
+    """
+    counter = [0]
+    args = list(args)
+
+    if operation == 'put' and len(args) > 1:
+        args[1] = _count(args[1], counter)
+
+    last_error(clear=True)
+    start = time.perf_counter()
+    result = error = None
+
+    def publish(bytes_in, ok, error):
+        record = Call(disk.name, disk.driver_name, operation, time.perf_counter() - start, bytes_in,
+                      counter[0], ok, error)
+
+        for subscriber in subscribers:
+            try:
+                subscriber(record)
+            except Exception as e:
+                print('Subscriber:', e)
+
+    try:
+        if profiler is not None:
+            result = profiler.run('%s-%s' % (disk.name, operation), call, operation, *args, **kwargs)
+        else:
+            result = call(operation, *args, **kwargs)
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        if error is None and result is False:
+            error = _recorded()
+
+        if error is not None or not (operation == 'iter_get' and isinstance(result, GeneratorType)):
+            publish(_size(result, args[1] if operation == 'get' and len(args) > 1 else None),
+                    error is None and result is not False, error)
+
+    if operation == 'iter_get' and isinstance(result, GeneratorType):
+        return _stream(result, publish)
+
+    return result
+
+
+def _recorded():
+    """Class name of the error the driver recorded before returning False, None if it recorded none"""
+    error = last_error()
+    return None if error is None else type(error).__name__
+
+
+def _count(content, counter):
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        counter[0] = len(content)
+    elif isinstance(content, str):
+        counter[0] = len(content.encode())
+    elif hasattr(content, 'read'):
+        try:
+            counter[0] = os.fstat(content.fileno()).st_size - content.tell()
+        except (OSError, AttributeError, ValueError):
+            pass
+    elif content is not None:
+        return _counted(content, counter)
+
+    return content
+
+
+def _counted(content, counter):
+    for chunk in content:
+        counter[0] += len(chunk)
+        yield chunk
+
+
+def _size(result, save_to):
+    if isinstance(result, (bytes, bytearray, str)):
+        return len(result)
+
+    if result is True and save_to is not None and os.path.isfile(save_to):
+        return os.path.getsize(save_to)
+
+    return 0
+
+
+def _stream(chunks, publish):
+    size = 0
+    error = None
+
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        publish(size, error is None, error)
+
+
+class Histogram:
+    """Histogram of values in fixed buckets, quantiles are the upper bound of their bucket"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        rank = q * self.count
+        total = 0
+
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+
+            if count and total >= rank:
+                return bound
+
+        return 0.0
+
+
+class Histograms:
+    """ Histograms class keep in-process metrics of calls
+
+    Subscriber which keeps latency histogram, calls, errors and bytes for every disk, driver and operation.
+
+    Examples:
+        histograms = Histograms()
+        Disk.subscribe(histograms)
+
+        for row in histograms.summary():
+            print(row['disk'], row['operation'], row['seconds'], row['p99'])
+
+        histograms.export('/var/lib/node_exporter/diskpy.prom')
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.series = {}
+        self.lock = Lock()
+
+    def __call__(self, call):
+        key = (call.disk, call.driver, call.operation)
+
+        with self.lock:
+            series = self.series.get(key)
+
+            if series is None:
+                series = self.series[key] = {'latency': Histogram(self.buckets), 'errors': 0, 'bytes_in': 0,
+                                             'bytes_out': 0}
+
+            series['latency'].observe(call.seconds)
+            series['errors'] += not call.ok
+            series['bytes_in'] += call.bytes_in
+            series['bytes_out'] += call.bytes_out
+
+    def summary(self):
+        """Summary of calls
+
+        Returns:
+            list: dict for every disk, driver and operation, the most total seconds first.
+        """
+        with self.lock:
+            rows = [{
+                'disk': disk,
+                'driver': driver,
+                'operation': operation,
+                'calls': s['latency'].count,
+                'errors': s['errors'],
+                'seconds': s['latency'].sum,
+                'p50': s['latency'].quantile(0.5),
+                'p99': s['latency'].quantile(0.99),
+                'bytes_in': s['bytes_in'],
+                'bytes_out': s['bytes_out']
+            } for (disk, driver, operation), s in self.series.items()]
+
+        return sorted(rows, key=lambda row: row['seconds'], reverse=True)
+
+    def prometheus(self, prefix='diskpy'):
+        """Metrics in Prometheus text format
+
+        Returns:
+            str: latency histograms, error and bytes counters.
+        """
+        lines = ['# TYPE %s_call_seconds histogram' % prefix]
+        counters = []
+
+        with self.lock:
+            for (disk, driver, operation), s in sorted(self.series.items()):
+                labels = 'disk="%s",driver="%s",operation="%s"' % (disk, driver, operation)
+                total = 0
+
+                for bound, count in zip(self.buckets, s['latency'].counts):
+                    total += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('%s_call_seconds_bucket{%s,le="%s"} %d' % (prefix, labels, le, total))
+
+                lines.append('%s_call_seconds_sum{%s} %r' % (prefix, labels, s['latency'].sum))
+                lines.append('%s_call_seconds_count{%s} %d' % (prefix, labels, s['latency'].count))
+
+                for name in ('errors', 'bytes_in', 'bytes_out'):
+                    counters.append((name, '%s_%s_total{%s} %d' % (prefix, name, labels, s[name])))
+
+        for name in ('errors', 'bytes_in', 'bytes_out'):
+            lines.append('# TYPE %s_%s_total counter' % (prefix, name))
+            lines += [line for n, line in counters if n == name]
+
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path, prefix='diskpy'):
+        """Write the Prometheus text to file, replaced at once so scrapers never read half of it"""
+        with open(path + '.tmp', 'w') as f:
+            f.write(self.prometheus(prefix))
+
+        os.replace(path + '.tmp', path)
+
+
+class StatsdSink:
+    """ StatsdSink class write calls as StatsD lines
+
+    Subscriber which writes every call as StatsD timer and counters to local text file or any callable,
+    eg. send of UDP socket.
+
+    Examples:
+        Disk.subscribe(StatsdSink('/var/log/diskpy.statsd'))
+    """
+
+    def __init__(self, path=None, send=None, prefix='diskpy'):
+        """Init StatsdSink object
+
+        Args:
+            path (optional[str]): text file to append lines to it.
+            send (optional[callable]): receive the lines of each call as str.
+            prefix (optional[str]): prefix of metric names.
+
+        Returns:
+            StatsdSink class object
+        """
+        self.path = path
+        self.send = send
+        self.prefix = prefix
+        self.lock = Lock()
+
+    def __call__(self, call):
+        name = '%s.%s.%s.%s' % (self.prefix, call.disk, call.driver, call.operation)
+        lines = ['%s.time:%.3f|ms' % (name, call.seconds * 1000)]
+
+        if call.bytes_in:
+            lines.append('%s.bytes_in:%d|c' % (name, call.bytes_in))
+
+        if call.bytes_out:
+            lines.append('%s.bytes_out:%d|c' % (name, call.bytes_out))
+
+        if not call.ok:
+            lines.append('%s.errors.%s:1|c' % (name, call.error or 'unknown'))
+
+        lines = '\n'.join(lines) + '\n'
+
+        if self.send is not None:
+            self.send(lines)
+
+        if self.path is not None:
+            with self.lock, open(self.path, 'a') as f:
+                f.write(lines)
+
+
+class SlowProfiler:
+    """ SlowProfiler class profile slow calls
+
+    A sample of calls runs under cProfile, stats of the ones slower than the threshold are saved.
+    One call is profiled at a time, the others run without profiler.
+
+    Examples:
+        Disk.profiler = SlowProfiler(threshold=0.5, path='profiles', sample=0.1)
+
+        # python -m pstats profiles/<time>-disk_2-get.prof
+    """
+
+    def __init__(self, threshold=1.0, path='profiles', sample=0.01):
+        """Init SlowProfiler object
+
+        Args:
+            threshold (optional[float]): seconds a call takes to save its stats.
+            path (optional[str]): folder to save the .prof files in it.
+            sample (optional[float]): fraction of calls to profile.
+
+        Returns:
+            SlowProfiler class object
+        """
+        self.threshold = threshold
+        self.path = path
+        self.sample = sample
+        self.lock = Lock()
+
+        os.makedirs(path, exist_ok=True)
+
+    def run(self, name, call, *args, **kwargs):
+        if random.random() >= self.sample or not self.lock.acquire(False):
+            return call(*args, **kwargs)
+
+        try:
+            profile = cProfile.Profile()
+
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is active
+                return call(*args, **kwargs)
+
+            start = time.perf_counter()
+
+            try:
+                return call(*args, **kwargs)
+            finally:
+                profile.disable()
+
+                if time.perf_counter() - start >= self.threshold:
+                    profile.dump_stats(os.path.join(self.path, '%d-%s.prof' % (time.time() * 1000, name)))
+        finally:
+            self.lock.release()
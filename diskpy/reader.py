@@ -0,0 +1,139 @@
+import io
+from collections import OrderedDict
+
+
+class RangeReader(io.RawIOBase):
+    """ RangeReader class read remote file as seekable file
+
+    Read-only file object on top of the byte-range reads of a disk, the file is read in blocks kept in
+    an LRU cache, so random access costs only the blocks touched.
+    Sequential reads grow the read-ahead, the next blocks are fetched in the same range request,
+    a seek to another place resets it.
+    """
+
+    def __init__(self, disk, filename, size, block_size=256 * 1024, cache_size=64, max_readahead=16):
+        """Init RangeReader object
+
+        Args:
+            disk (Disk): the disk to read from.
+            filename (str): the name of the file.
+            size (int): the size of the file in bytes.
+            block_size (optional[int]): size of each cached block in bytes.
+            cache_size (optional[int]): max number of cached blocks.
+            max_readahead (optional[int]): max number of blocks fetched ahead of sequential reads.
+
+        Returns:
+            RangeReader class object
+        """
+        super().__init__()
+        self.disk = disk
+        self.name = filename
+        self.size = size
+        self.block_size = block_size
+        self.cache_size = max(cache_size, max_readahead + 1)
+        self.max_readahead = max_readahead
+        self.readahead = 0
+        self.position = 0
+        self.last = None
+        self.blocks = OrderedDict()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._checkClosed()
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._checkClosed()
+
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError('Invalid whence: ' + str(whence))
+
+        if position < 0:
+            raise ValueError('Negative seek position: ' + str(position))
+
+        self.position = position
+        return position
+
+    def readinto(self, buffer):
+        self._checkClosed()
+
+        view = memoryview(buffer).cast('B')
+        end = min(self.size, self.position + len(view))
+        written = 0
+
+        while self.position < end:
+            index, start = divmod(self.position, self.block_size)
+            block = self.__block(index)[start:start + end - self.position]
+
+            # The file is shorter than its size, it changed while open
+            if not block:
+                break
+
+            view[written:written + len(block)] = block
+            written += len(block)
+            self.position += len(block)
+
+        return written
+
+    def readall(self):
+        return self.read(max(0, self.size - self.position))
+
+    def read(self, size=-1):
+        self._checkClosed()
+
+        if size is None or size < 0:
+            return self.readall()
+
+        buffer = bytearray(min(size, max(0, self.size - self.position)))
+        return bytes(buffer[:self.readinto(buffer)])
+
+    def close(self):
+        self.blocks.clear()
+        super().close()
+
+    def __block(self, index):
+        block = self.blocks.get(index)
+
+        # Sequential reads grow the read-ahead, jumps reset it
+        if self.last is not None and index == self.last + 1:
+            self.readahead = min(self.max_readahead, max(1, self.readahead * 2))
+        elif index != self.last:
+            self.readahead = 0
+
+        self.last = index
+
+        if block is not None:
+            self.blocks.move_to_end(index)
+            return block
+
+        # Fetch the missing run of blocks in one range read
+        count = 1
+        last = (self.size - 1) // self.block_size
+
+        while count <= self.readahead and index + count <= last and index + count not in self.blocks:
+            count += 1
+
+        offset = index * self.block_size
+        content = self.disk.get(self.name, offset=offset, length=count * self.block_size)
+
+        if content is False:
+            raise OSError('Failed to read %s at %d' % (self.name, offset))
+
+        for i in range(count):
+            self.blocks[index + i] = content[i * self.block_size:(i + 1) * self.block_size]
+
+        while len(self.blocks) > self.cache_size:
+            self.blocks.popitem(last=False)
+
+        return self.blocks[index]
@@ -0,0 +1,218 @@
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
+
+from .drivers.utils import last_error
+
+# Methods which can run again after a failure, put only when its content can be read again
+RETRIED = ('put', 'get', 'iter_get', 'get_if_changed', 'delete', 'copy', 'move', 'exist', 'size', 'permissions',
+           'make_dir', 'delete_dir')
+
+# Idempotent reads which can be sent twice at once
+HEDGED = ('get', 'exist')
+
+# Error class names of throttling, server errors and dropped connections
+TRANSIENT = ('RateLimitError', 'InternalServerError', 'error_temp', 'EOFError', 'ConnectionError', 'TimeoutError',
+             'EndpointConnectionError', 'ConnectTimeoutError', 'ReadTimeoutError', 'ConnectionClosedError',
+             'ProtocolError')
+
+# S3 error codes which can succeed on retry
+CODES = ('SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded', 'RequestTimeout',
+         'RequestTimeoutException', 'InternalError', 'ServiceUnavailable', 'TooManyRequests')
+
+
+def transient(error):
+    """Check storage error
+
+    Args:
+        error (Exception): error raised by the SDK or connection.
+
+    Returns:
+        tuple: (True, seconds to wait or None) if the error is transient, (False, None) otherwise.
+    """
+    if error is None:
+        return False, None
+
+    # Dropbox rate limit carries the wait time
+    if getattr(error, 'backoff', None) is not None:
+        return True, float(error.backoff)
+
+    response = getattr(error, 'response', None)
+
+    if isinstance(response, dict):
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        code = response.get('Error', {}).get('Code')
+
+        if code in CODES or status == 429 or status >= 500:
+            return True, _seconds(response.get('ResponseMetadata', {}).get('HTTPHeaders', {}).get('retry-after'))
+
+        return False, None
+
+    # Dropbox HTTP errors
+    if (getattr(error, 'status_code', None) or 0) >= 500:
+        return True, None
+
+    if any(cls.__name__ in TRANSIENT for cls in type(error).__mro__):
+        return True, None
+
+    return False, None
+
+
+def _seconds(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Retry:
+    """ Retry class run driver calls again on transient errors
+
+    Wrap a driver, calls which fail with throttling, server errors or dropped connections are retried
+    with jittered exponential backoff, retry-after hints of the storage are honored.
+    Errors which are not transient, like missing file, return at once.
+    With hedge, get and exist send a second request when the first one is slower than the p95 latency.
+    """
+
+    def __init__(self, driver, attempts=4, base=0.1, cap=10.0, hedge=False, hedge_after=0.95, window=200,
+                 workers=8):
+        """Init Retry object
+
+        Args:
+            driver (object): the driver to wrap.
+            attempts (optional[int]): max attempts of each call.
+            base (optional[float]): seconds of the first backoff, doubled after each attempt.
+            cap (optional[float]): max seconds of a backoff.
+            hedge (optional[boolean]): send second request of slow get and exist.
+            hedge_after (optional[float]): latency quantile of the last calls a request waits before hedging.
+            window (optional[int]): number of last calls the latency quantile is computed from.
+            workers (optional[int]): max number of threads running hedged requests.
+
+        Returns:
+            Retry class object
+        """
+        self.driver = driver
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.latency = {method: deque(maxlen=window) for method in HEDGED}
+        self.executor = ThreadPoolExecutor(workers) if hedge else None
+        self.lock = Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.driver, name)
+
+        if name not in RETRIED or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if name in HEDGED and self.hedge and not (name == 'get' and _save_to(args, kwargs)):
+                return self.__hedged(name, attr, *args, **kwargs)
+
+            return self.__retried(name, attr, *args, **kwargs)
+
+        return call
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+        if hasattr(self.driver, 'close'):
+            self.driver.close()
+
+    def __retried(self, name, call, *args, **kwargs):
+        content = args[1] if name == 'put' and len(args) > 1 else kwargs.get('content')
+        position = _position(content)
+
+        # Generators and unseekable files are read once
+        attempts = self.attempts if name != 'put' or position is not False else 1
+
+        for attempt in range(attempts):
+            last_error(clear=True)
+            error = None
+
+            try:
+                result = call(*args, **kwargs)
+            except Exception as e:
+                error, result = e, False
+
+            if result is not False:
+                return result
+
+            retry, wait_for = transient(error or last_error())
+
+            if not retry or attempt == attempts - 1:
+                break
+
+            # Full jitter, the server hint is the least wait
+            backoff = random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+            time.sleep(max(backoff, wait_for or 0))
+
+            if position is not None and position is not False:
+                content.seek(position)
+
+        if error is not None:
+            raise error
+
+        return False
+
+    def __hedged(self, name, call, *args, **kwargs):
+        start = time.monotonic()
+        requests = [self.executor.submit(self.__retried, name, call, *args, **kwargs)]
+        done, pending = wait(requests, timeout=self.__quantile(name))
+
+        if not done:
+            requests.append(self.executor.submit(self.__retried, name, call, *args, **kwargs))
+            done, pending = wait(requests, return_when=FIRST_COMPLETED)
+            future = done.pop()
+
+            # The first answer failed, the other request may still succeed
+            if pending and (future.exception() is not None or future.result() is False):
+                future = pending.pop()
+        else:
+            future = done.pop()
+
+        result = future.result()
+
+        with self.lock:
+            self.latency[name].append(time.monotonic() - start)
+
+        return result
+
+    def __quantile(self, name):
+        with self.lock:
+            values = sorted(self.latency[name])
+
+        # Too few calls to know the tail, do not hedge yet
+        if len(values) < 20:
+            return None
+
+        return values[int(self.hedge_after * (len(values) - 1))]
+
+
+def _save_to(args, kwargs):
+    return (len(args) > 1 and args[1] is not None) or kwargs.get('save_to') is not None
+
+
+def _position(content):
+    """Position to rewind content to before retry
+
+    Returns:
+        int: position of seekable file.
+        None: content is str, bytes or empty and can be sent again.
+        bool: False if content can be read once.
+    """
+    if content is None or isinstance(content, (str, bytes, bytearray)):
+        return None
+
+    try:
+        if content.seekable():
+            return content.tell()
+    except (AttributeError, OSError, ValueError):
+        pass
+
+    return False
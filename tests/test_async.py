@@ -0,0 +1,48 @@
+from diskpy import AsyncDisk, SettingException
+import asyncio
+import pytest
+
+disk = None
+
+
+def test_disk():
+    global disk
+
+    try:
+        disk = AsyncDisk('local')
+    except SettingException:
+        assert False
+
+
+def test_put_text():
+    assert asyncio.run(disk.put('async.txt', 'some text'))
+
+
+def test_get_gather():
+    async def gather():
+        return await asyncio.gather(*[disk.get('async.txt') for _ in range(8)])
+
+    assert asyncio.run(gather()) == ['some text'] * 8
+
+
+def test_iter_get():
+    async def collect():
+        return b''.join([chunk async for chunk in disk.iter_get('async.txt', chunk_size=4)])
+
+    assert asyncio.run(collect()) == b'some text'
+
+
+def test_iter_get_missing():
+    async def collect():
+        return [chunk async for chunk in disk.iter_get('missing.txt')]
+
+    with pytest.raises(OSError):
+        asyncio.run(collect())
+
+
+def test_files_list():
+    assert 'async.txt' in asyncio.run(disk.files())
+
+
+def test_delete():
+    assert asyncio.run(disk.delete('async.txt'))
@@ -0,0 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor
+from diskpy.cache import MetadataCache, ContentCache
+import os
+import time
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_get_and_set():
+    cache = MetadataCache(ttl=30)
+    cache.set(('exist', ('filename.txt',), ()), True)
+
+    assert cache.get(('exist', ('filename.txt',), ())) == (True, True)
+    assert cache.get(('exist', ('filename2.txt',), ())) == (False, None)
+
+
+def test_negative_ttl():
+    cache = MetadataCache(ttl=30, negative_ttl=0.01)
+    cache.set(('exist', ('filename.txt',), ()), False)
+
+    assert cache.get(('exist', ('filename.txt',), ())) == (True, False)
+    time.sleep(0.02)
+    assert cache.get(('exist', ('filename.txt',), ())) == (False, None)
+
+
+def test_lru_eviction():
+    cache = MetadataCache(size=2)
+    cache.set(('exist', ('filename1.txt',), ()), True)
+    cache.set(('exist', ('filename2.txt',), ()), True)
+    cache.get(('exist', ('filename1.txt',), ()))
+    cache.set(('exist', ('filename3.txt',), ()), True)
+
+    assert cache.get(('exist', ('filename1.txt',), ()))[0]
+    assert not cache.get(('exist', ('filename2.txt',), ()))[0]
+
+
+def test_invalidate():
+    cache = MetadataCache()
+    cache.set(('exist', ('filename1.txt',), ()), True)
+    cache.set(('exist', ('filename2.txt',), ()), True)
+    cache.set(('files', (None, None, None), ()), ['filename1.txt', 'filename2.txt'])
+    cache.invalidate(['filename1.txt'])
+
+    assert not cache.get(('exist', ('filename1.txt',), ()))[0]
+    assert cache.get(('exist', ('filename2.txt',), ()))[0]
+    assert not cache.get(('files', (None, None, None), ()))[0]
+
+
+class Remote:
+    """In memory driver with revisions, counts downloads"""
+
+    def __init__(self):
+        self.files = {}
+        self.downloads = 0
+
+    def put(self, filename, content=None):
+        self.files[filename] = content.encode()
+        return True
+
+    def get_if_changed(self, filename, revision=None, chunk_size=65536):
+        content = self.files[filename]
+        current = str(hash(content))
+
+        if current == revision:
+            return revision, None
+
+        time.sleep(0.01)
+        self.downloads += 1
+        return current, iter([content])
+
+
+def test_content_cache():
+    remote = Remote()
+    cache = ContentCache(remote, BASE + '/local_disk/cache', size=20)
+    cache.put('filename1.txt', 'some text')
+
+    assert cache.get('filename1.txt') == b'some text'
+    assert b''.join(cache.iter_get('filename1.txt')) == b'some text'
+    assert remote.downloads == 1
+
+    # Changed behind the cache, revalidation downloads it again
+    remote.files['filename1.txt'] = b'other text'
+    assert cache.get('filename1.txt') == b'other text'
+    assert remote.downloads == 2
+
+
+def test_content_cache_eviction():
+    remote = Remote()
+    cache = ContentCache(remote, BASE + '/local_disk/cache', size=20)
+    cache.put('filename1.txt', 'some text')
+    cache.put('filename2.txt', 'some text')
+    cache.put('filename3.txt', 'some text')
+
+    for name in ['filename1.txt', 'filename2.txt', 'filename3.txt']:
+        cache.get(name)
+
+    assert list(cache.entries) == ['filename2.txt', 'filename3.txt']
+    assert cache.used == 18
+
+
+def test_content_cache_collapse():
+    remote = Remote()
+    cache = ContentCache(remote, BASE + '/local_disk/cache')
+    cache.put('filename1.txt', 'some text')
+
+    with ThreadPoolExecutor(8) as executor:
+        contents = list(executor.map(lambda _: cache.get('filename1.txt'), range(8)))
+
+    assert contents == [b'some text'] * 8
+    assert remote.downloads == 1
+
+
+def test_content_cache_evicted_while_reading():
+    remote = Remote()
+    cache = ContentCache(remote, BASE + '/local_disk/cache')
+    cache.put('filename1.txt', 'some text')
+
+    chunks = cache.iter_get('filename1.txt', chunk_size=4)
+    cache.invalidate(['filename1.txt'])
+
+    # The copy was open before it was removed
+    assert b''.join(chunks) == b'some text'
+
+
+def test_content_cache_shared_path():
+    first, second = Remote(), Remote()
+    cache = ContentCache(first, BASE + '/local_disk/cache', name='disk_1')
+    first.put('filename1.txt', 'some text')
+    assert cache.get('filename1.txt') == b'some text'
+
+    ContentCache(second, BASE + '/local_disk/cache', name='disk_2')
+    assert os.listdir(cache.path)
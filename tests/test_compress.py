@@ -0,0 +1,71 @@
+from diskpy.compress import Compression
+from diskpy.drivers import Local
+import gzip
+import os
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+
+disk = Compression(Local({'base': BASE + '/local_disk/compress'}))
+
+
+def test_put_compressed():
+    assert disk.put('log.txt', 'some text ' * 100)
+    assert os.path.isfile(BASE + '/local_disk/compress/log.txt.diskpy.gz')
+    assert os.path.getsize(BASE + '/local_disk/compress/log.txt.diskpy.gz') < 1000
+
+
+def test_get():
+    assert disk.get('log.txt') == b'some text ' * 100
+    assert b''.join(disk.iter_get('log.txt', chunk_size=8)) == b'some text ' * 100
+    assert disk.get('missing.txt') is False
+
+
+def test_skip_compressed():
+    assert disk.put('data.bin', gzip.compress(b'some text'))
+    assert os.path.isfile(BASE + '/local_disk/compress/data.bin')
+    assert disk.get('data.bin') == gzip.compress(b'some text')
+
+
+def test_compressed_name():
+    assert disk.put('archive.tar.gz', gzip.compress(b'some text'))
+    assert disk.get('archive.tar.gz') == gzip.compress(b'some text')
+    assert disk.get('archive.tar') is False
+    assert disk.delete('archive.tar.gz')
+
+
+def test_files_list():
+    assert sorted(disk.files()) == ['data.bin', 'log.txt']
+    assert disk.files(suffix='.txt') == ['log.txt']
+    assert disk.exist('log.txt')
+
+
+def test_delete():
+    assert disk.delete_many(['log.txt', 'data.bin']) == {'log.txt': True, 'data.bin': True}
+    assert disk.files() == []
+
+
+class Recording:
+    """Driver which keeps what put received, put takes binary like FTP"""
+
+    def __init__(self):
+        self.puts = []
+
+    def put(self, filename, content=None, binary=False):
+        sized = isinstance(content, bytes) or hasattr(content, 'fileno')
+        self.puts.append((filename, content if isinstance(content, bytes) else content.read(), sized, binary))
+        return True
+
+    def exist(self, filename):
+        return False
+
+
+def test_put_sized():
+    driver = Recording()
+    small = Compression(driver, spool_size=1024)
+    small.put('log.txt', 'some text ' * 100)
+    small.put('log.txt', os.urandom(4096))
+
+    # Small output is bytes, larger is a file, both have a size and go in binary mode
+    assert [(p[0], type(p[1]), p[2], p[3]) for p in driver.puts] == [('log.txt.diskpy.gz', bytes, True, True)] * 2
+    assert gzip.decompress(driver.puts[0][1]) == b'some text ' * 100
+    assert len(gzip.decompress(driver.puts[1][1])) == 4096
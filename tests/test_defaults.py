@@ -1,5 +1,7 @@
 from diskpy import Disk, SettingException
 from diskpy.drivers import Local
+import subprocess
+import sys
 
 
 def test_driver():
@@ -9,3 +11,30 @@ def test_driver():
         assert False
 
     assert isinstance(disk.driver, Local)
+
+
+def test_shared_driver():
+    assert Disk().driver is Disk().driver
+
+
+def test_unhashable_kwargs():
+    Disk.setting['listed'] = {'driver': lambda setting, folders: Local({'base': '/'.join(folders)})}
+
+    try:
+        assert Disk('listed', folders=['local_disk', 'listed']).driver is \
+            Disk('listed', folders=['local_disk', 'listed']).driver
+    finally:
+        del Disk.setting['listed']
+
+
+def test_reset():
+    driver = Disk().driver
+    Disk.reset()
+
+    assert Disk().driver is not driver
+
+
+def test_lazy_imports():
+    code = 'import sys; from diskpy.drivers import *; print(sorted({"boto3", "dropbox", "asyncio"} & set(sys.modules)))'
+
+    assert subprocess.check_output([sys.executable, '-c', code]).strip() == b'[]'
@@ -1,4 +1,5 @@
 from diskpy import Disk, SettingException
+import io
 import os
 
 BASE = os.path.dirname(os.path.abspath(__file__))
@@ -25,10 +26,39 @@ def test_put_file():
         f.close()
 
 
+def test_put_session():
+    with open(BASE + '/post.txt', 'rb') as f:
+        assert disk.put('filename4.txt', f, session=True)
+        f.close()
+
+    assert disk.delete('filename4.txt')
+
+
 def test_get():
     assert disk.get('filename.txt') == b'some text'
 
 
+def test_get_range():
+    assert disk.get('filename.txt', offset=5) == b'text'
+    assert disk.get('filename.txt', offset=-4, length=2) == b'te'
+    assert disk.get('filename.txt', offset=0, length=4) == b'some'
+
+
+def test_size():
+    assert disk.size('filename.txt') == 9
+
+
+def test_open():
+    with disk.open('filename.txt', block_size=4) as f:
+        assert f.read(4) == b'some'
+        assert f.seek(-4, io.SEEK_END) == 5
+        assert f.read() == b'text'
+
+
+def test_iter_get():
+    assert b''.join(disk.iter_get('filename.txt', chunk_size=4)) == b'some text'
+
+
 def test_get_and_save():
     assert disk.get('filename.txt', save_to=BASE + '/local_disk/saved.txt') != False
 
@@ -63,13 +93,19 @@ def test_delete_files():
     assert disk.delete('filename3.txt')
 
 
+def test_delete_many():
+    assert disk.put('many1.txt', 'some text')
+    assert disk.put('many2.txt', 'some text')
+    assert disk.delete_many(['many1.txt', 'many2.txt']) == {'many1.txt': True, 'many2.txt': True}
+
+
 def test_make_dir():
     assert disk.make_dir('folder')
     assert disk.make_dir('folder/sub_folder')
 
 
 def test_dirs_list():
-    assert disk.dirs('folder')[0].name == 'sub_folder'
+    assert next(disk.dirs('folder')).name == 'sub_folder'
 
 
 def test_delete_dir():
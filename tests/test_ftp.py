@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from diskpy import Disk, SettingException
 import os
 
@@ -33,12 +34,45 @@ def test_get():
     assert disk.get('filename.txt', callback=callback)
 
 
+def test_get_range():
+    assert disk.get('filename.txt', offset=0, length=4) == b'some'
+    assert disk.get('filename.txt', offset=5, length=4) == b'text'
+
+
+def test_open():
+    with disk.open('filename.txt', block_size=4) as f:
+        assert f.read(4) == b'some'
+        assert f.read(5) == b' text'
+
+
+def test_iter_get():
+    # Text mode put ends the last line
+    assert b''.join(disk.iter_get('filename.txt', chunk_size=4)).rstrip() == b'some text'
+
+
+def test_get_concurrent():
+    with ThreadPoolExecutor(4) as executor:
+        chunks = executor.map(lambda _: b''.join(disk.iter_get('filename.txt')).rstrip(), range(8))
+
+    assert all(c == b'some text' for c in chunks)
+
+
 def test_get_and_save():
     assert disk.get('filename.txt', save_to=BASE + '/local_disk/saved.txt') != False
 
 
 def test_copy():
     assert disk.copy('filename.txt', 'filename3.txt')
+    assert b''.join(disk.iter_get('filename3.txt')) == b''.join(disk.iter_get('filename.txt'))
+    assert not disk.copy('missing.txt', 'filename5.txt')
+
+
+def test_transfer_many_shared_driver():
+    # Both disks share the pooled driver, each transfer holds a connection while reading
+    result = Disk('ftp').transfer_many([('filename.txt', 'filename6.txt'), ('filename3.txt', 'filename7.txt')],
+                                       Disk('ftp'), concurrency=disk.driver.setting.get('pool_size'))
+    assert result == {'filename.txt': True, 'filename3.txt': True}
+    assert disk.delete_many(['filename6.txt', 'filename7.txt'])
 
 
 def test_move():
@@ -81,6 +115,12 @@ def test_delete_files():
     assert disk.delete('filename3.txt')
 
 
+def test_delete_many():
+    assert disk.put('many1.txt', 'some text')
+    assert disk.put('many2.txt', 'some text')
+    assert disk.delete_many(['many1.txt', 'many2.txt']) == {'many1.txt': True, 'many2.txt': True}
+
+
 def test_delete_dir():
     assert disk.delete_dir('folder/sub_folder')
     assert disk.delete_dir('folder')
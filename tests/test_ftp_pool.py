@@ -0,0 +1,178 @@
+from concurrent.futures import ThreadPoolExecutor
+from diskpy.drivers import FTP
+from ftplib import error_perm
+import io
+import pytest
+import time
+
+
+class Conn(io.BytesIO):
+    def makefile(self, mode):
+        return io.BytesIO(self.getvalue())
+
+    def recv(self, size):
+        return self.read(size)
+
+
+class Client:
+    """FTP session over in memory files, every reply a command leaves is counted until read"""
+
+    def __init__(self, files):
+        self.files = files
+        self.sock = object()
+        self.pending = 0
+
+    def voidcmd(self, cmd):
+        assert not self.pending, 'reply of the last command was not read'
+        return '200 OK'
+
+    def transfercmd(self, cmd, rest=None):
+        self.voidcmd(cmd)
+        name = cmd[len('RETR '):]
+
+        if name not in self.files:
+            raise error_perm('550 No such file')
+
+        if rest is not None:
+            if rest >= len(self.files[name]):
+                raise error_perm('554 Restart position out of range')
+
+            self.pending += 1
+            return Conn(self.files[name][rest:])
+
+        time.sleep(0.05)
+        self.pending += 1
+        return Conn(self.files[name])
+
+    def voidresp(self):
+        self.pending -= 1
+        return '226 Done'
+
+    def retrbinary(self, cmd, callback, blocksize=8192):
+        time.sleep(0.05)
+        content = self.transfercmd(cmd).getvalue()
+
+        for i in range(0, len(content), blocksize):
+            callback(content[i:i + blocksize])
+
+            if cmd.startswith('RETR broken/'):
+                raise ConnectionResetError('Connection reset by peer')
+
+        self.voidresp()
+
+    def storbinary(self, cmd, fp, blocksize=8192):
+        self.voidcmd(cmd)
+        name = cmd[len('STOR '):]
+
+        if name.startswith('readonly/'):
+            raise error_perm('553 Permission denied')
+
+        self.files[name] = fp.read()
+
+    def mlsd(self, path, facts=()):
+        if path.endswith('missing'):
+            raise error_perm('550 No such directory')
+
+        # Facts are left out like some servers do
+        yield 'a.txt', {'type': 'file', 'size': '1', 'modify': '20240101000000'}
+        yield 'b.txt', {'type': 'file'}
+
+    def size(self, path):
+        if path not in self.files:
+            raise error_perm('550 No such file')
+
+        return len(self.files[path])
+
+    def sendcmd(self, cmd):
+        return '213 20240101000000'
+
+    def quit(self):
+        pass
+
+
+def driver(files, pool_size):
+    ftp = FTP({'pool_size': pool_size})
+    ftp.pool.connect = lambda: Client(files)
+    return ftp
+
+
+def test_copy_full_pool():
+    files = {'a.txt': b'a', 'b.txt': b'b'}
+    ftp = driver(files, 2)
+
+    # Each copy holds one connection, the second one is not waited for
+    with ThreadPoolExecutor(2) as executor:
+        results = executor.map(lambda f: ftp.copy(f, f + '.copy'), ['a.txt', 'b.txt'], timeout=5)
+        assert list(results) == [True, True]
+
+    assert files['a.txt.copy'] == b'a'
+    assert files['b.txt.copy'] == b'b'
+
+
+def test_copy_binary():
+    files = {'a.txt': b'a\r\n'}
+    ftp = driver(files, 2)
+
+    assert ftp.copy('a.txt', 'b.txt', binary=True)
+    assert ftp.copy('a.txt', 'c.txt', True)
+    assert files['b.txt'] == files['c.txt'] == b'a\r\n'
+
+
+def test_copy_failed_store():
+    files = {'a.txt': b'a'}
+    ftp = driver(files, 2)
+
+    assert not ftp.copy('a.txt', 'readonly/a.txt')
+
+    # The pooled sessions are in sync after the failure
+    assert ftp.copy('a.txt', 'b.txt')
+    assert files['b.txt'] == b'a'
+
+
+def test_iter_get_dropped():
+    files = {'a.txt': b'a' * 64}
+    ftp = driver(files, 1)
+
+    # More blocks than the queue holds, the transfer waits for the reader
+    assert ftp.iter_get('a.txt', chunk_size=4, queue_size=2) is not False
+
+    with ftp.pool.connection() as client:
+        assert client is not None
+
+
+def test_iter_get_broken():
+    files = {'broken/a.txt': b'a' * 64}
+    ftp = driver(files, 1)
+    content = ftp.iter_get('broken/a.txt', chunk_size=4)
+
+    assert next(content) == b'aaaa'
+
+    with pytest.raises(ConnectionResetError):
+        list(content)
+
+
+def test_iter_get_refused():
+    ftp = driver({}, 1)
+
+    def refuse():
+        raise ConnectionRefusedError('Connection refused')
+
+    ftp.pool.connect = refuse
+    assert ftp.iter_get('a.txt') is False
+
+
+def test_walk_missing_facts():
+    ftp = driver({'/a.txt': b'a', '/b.txt': b'bb'}, 1)
+    assert sorted(ftp.files('', recursive=True)) == [('a.txt', 1, 1704067200, None), ('b.txt', 2, 1704067200, None)]
+
+    with pytest.raises(error_perm):
+        list(ftp.files('missing', recursive=True))
+
+
+def test_get_range_past_end():
+    ftp = driver({'a.txt': b'some text'}, 1)
+
+    assert ftp.get('a.txt', offset=5) == b'text'
+    assert ftp.get('a.txt', offset=9) == b''
+    assert ftp.get('a.txt', offset=20, length=4) == b''
+    assert ftp.get('missing.txt', offset=20) is False
@@ -1,5 +1,7 @@
 from diskpy import Disk, SettingException
+import io
 import os
+import pytest
 
 BASE = os.path.dirname(os.path.abspath(__file__))
 
@@ -30,12 +32,101 @@ def test_get():
     assert disk.get('filename.txt') == 'some text'
 
 
+def test_get_range():
+    assert disk.get('filename.txt', offset=5) == b'text'
+    assert disk.get('filename.txt', offset=-4, length=2) == b'te'
+    assert disk.get('filename.txt', offset=0, length=4) == b'some'
+
+
+def test_size():
+    assert disk.size('filename.txt') == 9
+
+
+def test_open():
+    with disk.open('filename.txt', block_size=4) as f:
+        assert f.read(4) == b'some'
+        assert f.seek(-4, io.SEEK_END) == 5
+        assert f.read() == b'text'
+
+
+def test_iter_get():
+    assert b''.join(disk.iter_get('filename.txt', chunk_size=4)) == b'some text'
+
+
+def test_open_mapped():
+    view = disk.open_mapped('filename.txt', access='random')
+
+    assert view.readonly
+    assert bytes(view[5:]) == b'text'
+    view.release()
+
+
 def test_get_and_save():
     assert disk.get('filename.txt', save_to=BASE + '/local_disk/filename3.txt') != False
 
 
 def test_copy():
     assert disk.copy('filename.txt', 'filename4.txt')
+    assert disk.get('filename4.txt') == 'some text'
+    assert not disk.copy('filename.txt', 'filename.txt')
+    assert disk.get('filename.txt') == 'some text'
+
+
+def test_transfer():
+    assert disk.transfer('filename.txt', disk, 'filename5.txt', chunk_size=4)
+    assert disk.get('filename5.txt') == 'some text'
+    assert disk.delete('filename5.txt')
+    assert not disk.transfer('missing.txt', disk, 'filename5.txt')
+
+
+def test_transfer_many_broken_stream():
+    def broken():
+        yield b'some'
+        raise ConnectionResetError('Connection reset by peer')
+
+    assert not disk.put('filename.txt', broken())
+    assert disk.get('filename.txt') == 'some text'
+
+    result = disk.transfer_many(['filename.txt', 'missing.txt'], disk, buffer_size=1)
+    assert result == {'filename.txt': True, 'missing.txt': False}
+
+
+def test_sync():
+    assert disk.put('sync/a.txt', 'a')
+    assert disk.put('sync/sub/b.txt', 'b')
+    assert disk.put('synced/old.txt', 'old')
+
+    result = disk.sync('sync', disk, 'synced', delete=True)
+    assert sorted(result['transferred']) == ['a.txt', 'sub/b.txt']
+    assert result['deleted'] == ['old.txt']
+    assert disk.get('synced/sub/b.txt') == 'b'
+
+    assert not disk.sync('sync', disk, 'synced')['transferred']
+    assert disk.delete_dir('sync')
+    assert disk.delete_dir('synced')
+
+
+def test_sync_keep():
+    assert disk.put('sync/a.txt', 'a')
+    assert disk.put('synced/keep.txt', 'keep')
+
+    result = disk.sync('sync', disk, 'synced')
+    assert result['transferred'] == ['a.txt']
+    assert result['deleted'] == []
+    assert disk.get('synced/keep.txt') == 'keep'
+
+    assert disk.delete_dir('sync')
+    assert disk.delete_dir('synced')
+
+
+def test_sync_missing_source():
+    assert disk.put('synced/keep.txt', 'keep')
+
+    with pytest.raises(OSError):
+        disk.sync('missing', disk, 'synced', delete=True)
+
+    assert disk.get('synced/keep.txt') == 'keep'
+    assert disk.delete_dir('synced')
 
 
 def test_move():
@@ -64,6 +155,13 @@ def test_files_list():
     assert files == expected
 
 
+def test_files_list_recursive():
+    files = sorted(disk.files(recursive=True))
+
+    assert [f.name for f in files] == ['filename1.txt', 'filename2.txt', 'filename3.txt', 'filename4.txt']
+    assert files[0].size == len('some text')
+
+
 def test_delete_files():
     assert disk.delete('filename1.txt')
     assert disk.delete('filename2.txt')
@@ -71,6 +169,12 @@ def test_delete_files():
     assert disk.delete('filename4.txt')
 
 
+def test_delete_many():
+    assert disk.put('many1.txt', 'some text')
+    assert disk.put('many2.txt', 'some text')
+    assert disk.delete_many(['many1.txt', 'many2.txt']) == {'many1.txt': True, 'many2.txt': True}
+
+
 def test_make_dir():
     assert disk.make_dir('folder')
     assert disk.make_dir('folder/sub_folder')
@@ -80,6 +184,10 @@ def test_dirs_list():
     assert disk.dirs('folder') == ['sub_folder']
 
 
+def test_dirs_list_recursive():
+    assert list(disk.dirs(recursive=True)) == ['folder', 'folder/sub_folder']
+
+
 def test_delete_dir():
     assert disk.delete_dir('folder')
 
@@ -0,0 +1,94 @@
+from diskpy.drivers.utils import record
+from diskpy.metrics import instrument, Call, Histograms, StatsdSink
+import pytest
+
+
+class Fake:
+    """Disk stand-in, runs methods of a dict"""
+    name = 'disk_1'
+    driver_name = 'Fake'
+
+    def __init__(self, **methods):
+        self.methods = methods
+
+    def run(self, method, *args, **kwargs):
+        return self.methods[method](*args, **kwargs)
+
+
+def call(disk, method, *args):
+    calls = []
+    result = instrument(disk, method, disk.run, args, {}, (calls.append,))
+    return result, calls
+
+
+def test_put_bytes_out():
+    disk = Fake(put=lambda f, content: b''.join(content) == b'abcdef')
+    result, calls = call(disk, 'put', 'filename.txt', (c for c in [b'abc', b'def']))
+
+    assert result
+    assert calls[0][:3] == ('disk_1', 'Fake', 'put')
+    assert calls[0].bytes_out == 6
+    assert calls[0].ok
+
+
+def test_iter_get_bytes_in():
+    disk = Fake(iter_get=lambda f: (c for c in [b'abc', b'de']))
+    result, calls = call(disk, 'iter_get', 'filename.txt')
+
+    assert not calls
+    assert b''.join(result) == b'abcde'
+    assert calls[0].bytes_in == 5
+
+
+def test_error_class():
+    def get(f):
+        raise KeyError(f)
+
+    disk = Fake(get=get, exist=lambda f: False)
+
+    with pytest.raises(KeyError):
+        call(disk, 'get', 'filename.txt')
+
+    assert call(disk, 'exist', 'filename.txt')[1][0][-2:] == (False, None)
+
+
+def test_recorded_error_class():
+    def get(f):
+        record(TimeoutError(f))
+        return False
+
+    disk = Fake(get=get, exist=lambda f: False)
+    assert call(disk, 'get', 'filename.txt')[1][0][-2:] == (False, 'TimeoutError')
+
+    # Cleared before each call, the last error is not taken for the next one
+    assert call(disk, 'exist', 'filename.txt')[1][0][-2:] == (False, None)
+
+    lines = []
+    StatsdSink(send=lines.append)(Call('disk_1', 'Fake', 'exist', 0.5, 0, 0, False, None))
+    assert lines[0].split('\n')[1] == 'diskpy.disk_1.Fake.exist.errors.unknown:1|c'
+
+
+def test_histograms():
+    histograms = Histograms()
+
+    for seconds in (0.002, 0.002, 0.2):
+        histograms(Call('disk_1', 'Local', 'get', seconds, 10, 0, True, None))
+
+    histograms(Call('disk_2', 'S3', 'put', 0.5, 0, 10, False, 'ClientError'))
+
+    rows = histograms.summary()
+    assert [r['disk'] for r in rows] == ['disk_2', 'disk_1']
+    assert rows[1]['calls'] == 3 and rows[1]['p50'] == 0.0025 and rows[1]['p99'] == 0.25
+    assert rows[0]['errors'] == 1
+
+    text = histograms.prometheus()
+    assert 'diskpy_call_seconds_count{disk="disk_1",driver="Local",operation="get"} 3' in text
+    assert 'diskpy_bytes_out_total{disk="disk_2",driver="S3",operation="put"} 10' in text
+
+
+def test_statsd_sink():
+    lines = []
+    StatsdSink(send=lines.append)(Call('disk_2', 'S3', 'put', 0.5, 0, 10, False, 'ClientError'))
+
+    assert lines[0].split('\n')[:3] == ['diskpy.disk_2.S3.put.time:500.000|ms', 'diskpy.disk_2.S3.put.bytes_out:10|c',
+                                        'diskpy.disk_2.S3.put.errors.ClientError:1|c']
@@ -0,0 +1,99 @@
+from diskpy.drivers.utils import record
+from diskpy.retry import Retry, transient
+from ftplib import error_temp, error_perm
+import io
+import time
+
+
+class ClientError(Exception):
+    """Like botocore ClientError"""
+
+    def __init__(self, code, status, retry_after=None):
+        super().__init__(code)
+        headers = {} if retry_after is None else {'retry-after': retry_after}
+        self.response = {'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status,
+                                                                        'HTTPHeaders': headers}}
+
+
+class Flaky:
+    """Driver which fails the first calls, errors are recorded and False returned like the drivers"""
+
+    def __init__(self, errors, delays=()):
+        self.errors = list(errors)
+        self.delays = list(delays)
+        self.calls = 0
+
+    def get(self, filename, save_to=None):
+        self.calls += 1
+
+        if self.delays:
+            time.sleep(self.delays.pop(0))
+
+        if self.errors:
+            record(self.errors.pop(0))
+            return False
+
+        return 'content'
+
+    def put(self, filename, content=None):
+        self.calls += 1
+
+        if self.errors:
+            content.read()
+            record(self.errors.pop(0))
+            return False
+
+        return content.read() == b'content'
+
+
+def test_transient():
+    assert transient(ClientError('SlowDown', 503, '2')) == (True, 2.0)
+    assert transient(ClientError('NoSuchKey', 404)) == (False, None)
+    assert transient(error_temp('421 Service not available')) == (True, None)
+    assert transient(error_perm('550 No such file')) == (False, None)
+    assert transient(ConnectionResetError()) == (True, None)
+
+
+def test_retry():
+    driver = Flaky([ClientError('SlowDown', 503), error_temp('421')])
+    assert Retry(driver, base=0.001).get('filename.txt') == 'content'
+    assert driver.calls == 3
+
+
+def test_permanent_error():
+    driver = Flaky([ClientError('NoSuchKey', 404)])
+    assert Retry(driver, base=0.001).get('filename.txt') is False
+    assert driver.calls == 1
+
+
+def test_attempts():
+    driver = Flaky([ClientError('SlowDown', 503)] * 5)
+    assert Retry(driver, attempts=3, base=0.001).get('filename.txt') is False
+    assert driver.calls == 3
+
+
+def test_retry_after():
+    driver = Flaky([ClientError('SlowDown', 503, '0.05')])
+    start = time.monotonic()
+    assert Retry(driver, base=0.001).get('filename.txt') == 'content'
+    assert time.monotonic() - start >= 0.05
+
+
+def test_put_rewind():
+    driver = Flaky([error_temp('421')])
+    assert Retry(driver, base=0.001).put('filename.txt', io.BytesIO(b'content'))
+    assert driver.calls == 2
+
+
+def test_hedge():
+    driver = Flaky([], [0.001] * 20 + [1])
+    retry = Retry(driver, hedge=True)
+
+    for i in range(20):
+        retry.get('filename.txt')
+
+    start = time.monotonic()
+    assert retry.get('filename.txt') == 'content'
+    assert time.monotonic() - start < 0.5
+    assert driver.calls == 22
+    retry.close()
@@ -1,4 +1,5 @@
 from diskpy import Disk, SettingException
+import io
 import os
 
 BASE = os.path.dirname(os.path.abspath(__file__))
@@ -26,18 +27,56 @@ def test_put_file():
         assert put
 
 
+def test_put_multipart():
+    parts = (b'x' * 1024 * 1024 for _ in range(12))
+    assert disk.put('test/multipart.bin', parts)
+    assert disk.delete('test/multipart.bin')
+
+
 def test_get():
     assert disk.get('test/filename.txt') == b'some text'
 
 
+def test_get_range():
+    assert disk.get('test/filename.txt', offset=5) == b'text'
+    assert disk.get('test/filename.txt', offset=-4, length=2) == b'te'
+    assert disk.get('test/filename.txt', offset=0, length=4) == b'some'
+
+
+def test_size():
+    assert disk.size('test/filename.txt') == 9
+
+
+def test_open():
+    with disk.open('test/filename.txt', block_size=4) as f:
+        assert f.read(4) == b'some'
+        assert f.seek(-4, io.SEEK_END) == 5
+        assert f.read() == b'text'
+
+
+def test_iter_get():
+    assert b''.join(disk.iter_get('test/filename.txt', chunk_size=4)) == b'some text'
+
+
 def test_get_and_save():
     assert disk.get('test/filename.txt', save_to=BASE + '/local_disk/saved.txt') != False
 
 
+def test_get_parallel():
+    assert disk.get('test/filename.txt', parallel=True) == b'some text'
+    assert disk.get('test/filename.txt', save_to=BASE + '/local_disk/saved.txt', parallel=True)
+
+
 def test_copy():
     assert disk.copy('test/filename.txt', 'test/filename3.txt')
 
 
+def test_copy_multipart():
+    assert disk.copy('test/filename.txt', 'test/filename4.txt', multipart=True)
+    assert disk.get('test/filename4.txt') == b'some text'
+    assert disk.delete('test/filename4.txt')
+
+
 def test_move():
     assert disk.move('test/filename.txt', 'test/filename1.txt')
 
@@ -57,7 +96,7 @@ def test_get_permissions():
 
 
 def test_files_list():
-    files = disk.files('test')
+    files = list(disk.files('test'))
     expected = ['test/filename1.txt', 'test/filename2.txt', 'test/filename3.txt']
 
     assert files == expected
@@ -70,8 +109,14 @@ def test_delete_files():
     assert disk.delete('test/filename3.txt')
 
 
+def test_delete_many():
+    assert disk.put('test/many1.txt', 'some text')
+    assert disk.put('test/many2.txt', 'some text')
+    assert disk.delete_many(['test/many1.txt', 'test/many2.txt']) == {'test/many1.txt': True, 'test/many2.txt': True}
+
+
 def test_dirs_list():
-    assert disk.dirs('test') == ['test/sub_folder/']
+    assert list(disk.dirs('test')) == ['test/sub_folder/']
 
 
 
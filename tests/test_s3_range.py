@@ -0,0 +1,93 @@
+from diskpy.drivers import s3
+from diskpy.drivers.s3 import S3
+from diskpy.reader import RangeReader
+from threading import Lock
+import io
+import pytest
+
+CONTENT = b'some text'
+
+
+class ClientError(Exception):
+    """Like botocore ClientError"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}}
+
+
+class Body:
+    def __init__(self, content):
+        self.content = content
+
+    def read(self):
+        return self.content
+
+
+class Client:
+    """S3 client which answers Range headers like S3, invalid ranges get the whole object"""
+
+    def __init__(self, content):
+        self.content = content
+        self.ranges = []
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': len(self.content)}
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.ranges.append(Range)
+
+        if Range is None:
+            return {'Body': Body(self.content)}
+
+        first, last = Range[len('bytes='):].split('-')
+        size = len(self.content)
+
+        if not first:
+            return {'Body': Body(self.content[-int(last):])}
+
+        if int(first) >= size:
+            raise ClientError('InvalidRange')
+
+        if last and int(last) < int(first):
+            return {'Body': Body(self.content)}
+
+        return {'Body': Body(self.content[int(first):int(last) + 1 if last else size])}
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    monkeypatch.setattr(s3, 'ClientError', ClientError)
+
+    # Built without boto3, the client is set directly
+    driver = S3.__new__(S3)
+    driver.setting = dict(S3.setting, part_size=2, concurrency=2)
+    driver.bucket_name = 'bucket'
+    driver._S3__client = Client(CONTENT)
+    driver._S3__lock = Lock()
+    return driver
+
+
+def test_get_range(driver):
+    assert driver.get('filename.txt', offset=5) == b'text'
+    assert driver.get('filename.txt', offset=-4, length=2) == b'te'
+    assert driver.get('filename.txt', offset=0, length=4) == b'some'
+    assert driver.get('filename.txt', offset=4, length=2) == b' t'
+    assert driver.client.ranges == ['bytes=5-', 'bytes=-4', 'bytes=0-3', 'bytes=4-5']
+
+
+def test_get_range_past_end(driver):
+    assert driver.get('filename.txt', offset=20) == b''
+    assert driver.get('filename.txt', offset=2, length=0) == b''
+
+
+def test_get_parallel(driver):
+    assert driver.get('filename.txt', parallel=True) == CONTENT
+    assert driver.client.ranges == ['bytes=0-1', 'bytes=2-3', 'bytes=4-5', 'bytes=6-7', 'bytes=8-8']
+
+
+def test_open(driver):
+    with RangeReader(driver, 'filename.txt', len(CONTENT), block_size=4) as f:
+        assert f.read(4) == b'some'
+        assert f.seek(-4, io.SEEK_END) == 5
+        assert f.read() == b'text'